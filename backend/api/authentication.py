@@ -0,0 +1,59 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from .db import use_primary
+
+TOKEN_CACHE_KEY = 'auth_token:{digest}'
+USER_TOKEN_CACHE_KEY = 'auth_token_user:{user_id}'
+
+
+def get_token_digest(key):
+    # В кэше хранится хэш токена, а не сам токен.
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_token_cache_key(key):
+    return TOKEN_CACHE_KEY.format(digest=get_token_digest(key))
+
+
+def get_user_token_cache_key(user_id):
+    return USER_TOKEN_CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate_token(key):
+    cache.delete(get_token_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    user_key = get_user_token_cache_key(user_id)
+    token_key = cache.get(user_key)
+    cache.delete_many([user_key] + ([token_key] if token_key else []))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кэшем токен -> пользователь.
+
+    Кэш живёт TOKEN_CACHE_TIMEOUT секунд и сбрасывается при удалении
+    токена и сохранении пользователя: смене пароля, деактивации.
+    Промах читает из основной базы: токен, выданный при входе, может
+    ещё не дойти до реплики.
+    """
+
+    def authenticate_credentials(self, key):
+        timeout = settings.TOKEN_CACHE_TIMEOUT
+        if not timeout:
+            with use_primary():
+                return super().authenticate_credentials(key)
+        cache_key = get_token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            with use_primary():
+                user, token = super().authenticate_credentials(key)
+            cache.set_many({
+                cache_key: token,
+                get_user_token_cache_key(user.pk): cache_key,
+            }, timeout)
+        return token.user, token
@@ -0,0 +1,67 @@
+import math
+import statistics
+import tracemalloc
+from time import perf_counter
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def timed(function, *args, **kwargs):
+    """Вызывает функцию и возвращает результат и время в миллисекундах."""
+    started = perf_counter()
+    result = function(*args, **kwargs)
+    return result, (perf_counter() - started) * 1000
+
+
+def format_timings(label, timings):
+    values = ' '.join(
+        'p{0}={1:.2f}ms'.format(percent, percentile(timings, percent))
+        for percent in PERCENTILES
+    )
+    return '{0}: n={1} {2} max={3:.2f}ms'.format(
+        label, len(timings), values, max(timings, default=0.0)
+    )
+
+
+def measure(function, repeat, warmup=1):
+    """Замеряет время, число SQL-запросов и пик выделенной памяти.
+
+    Память считается отдельным проходом: tracemalloc заметно замедляет
+    выполнение и исказил бы замер времени.
+    """
+    for _ in range(warmup):
+        function()
+    timings, queries, allocations = [], [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            timings.append(timed(function)[1])
+        queries.append(len(context.captured_queries))
+    for _ in range(max(repeat // 5, 1)):
+        tracemalloc.start()
+        function()
+        allocations.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        'timings': timings,
+        'queries': statistics.median(queries),
+        'allocations': statistics.median(allocations),
+    }
+
+
+def format_measurement(label, result):
+    return '{0} queries={1:g} peak_alloc={2:.1f}KiB'.format(
+        format_timings(label, result['timings']),
+        result['queries'],
+        result['allocations'] / 1024
+    )
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from recipes.models import Recipe
+from recipes.versions import get_table_version
+
+
+def get_request_table_version(request, table):
+    """Версия справочника, прочитанная из базы один раз за запрос."""
+    if not hasattr(request, 'table_versions'):
+        request.table_versions = {}
+    if table not in request.table_versions:
+        request.table_versions[table] = get_table_version(table)
+    return request.table_versions[table]
+
+
+def table_etag(table):
+    def etag(request, *args, **kwargs):
+        return '"{0}-{1}"'.format(
+            table, get_request_table_version(request, table)
+        )
+    return etag
+
+
+def table_last_modified(table):
+    def last_modified(request, *args, **kwargs):
+        return datetime.fromtimestamp(
+            get_request_table_version(request, table), tz=timezone.utc
+        )
+    return last_modified
+
+
+def recipe_etag(request, pk=None, *args, **kwargs):
+    if not request.user.is_anonymous:
+        return None
+    updated_at = Recipe.objects.filter(pk=pk).values_list(
+        'updated_at', flat=True
+    ).first()
+    if updated_at is None:
+        return None
+    return '"recipe-{0}-{1}"'.format(pk, updated_at.timestamp())
+
+
+def cache_headers(view):
+    """Разрешает общим кэшам хранить ответы анонимным пользователям."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ('Authorization',))
+        if request.user.is_anonymous:
+            patch_cache_control(
+                response, public=True, max_age=settings.HTTP_CACHE_MAX_AGE
+            )
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
+
+
+def conditional_table(table):
+    """Conditional GET для справочника по версии всей таблицы."""
+    def decorator(view):
+        return cache_headers(condition(
+            etag_func=table_etag(table),
+            last_modified_func=table_last_modified(table)
+        )(view))
+    return decorator
+
+
+def conditional_recipe(view):
+    """Conditional GET для рецепта по его updated_at.
+
+    Ответ авторизованным пользователям содержит их собственные флаги
+    избранного и списка покупок, поэтому валидируется только ответ
+    анонимным.
+    """
+    return cache_headers(condition(etag_func=recipe_etag)(view))
@@ -0,0 +1,216 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from threading import get_ident
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+database_routing = ContextVar('database_routing', default=None)
+request_execute_wrappers = ContextVar('request_execute_wrappers', default=())
+
+
+class DatabaseRouting:
+    """Состояние маршрутизации одного HTTP-запроса.
+
+    Реплика выбирается один раз на запрос: все его чтения видят один и
+    тот же снимок данных и идут по одному соединению. После первой
+    записи запрос до конца читает из основной базы, чтобы видеть только
+    что записанные данные.
+    """
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.replica_alias = (
+            random.choice(settings.DATABASE_REPLICAS)
+            if replica and settings.DATABASE_REPLICAS else None
+        )
+        self.wrote = False
+
+
+@contextmanager
+def use_primary():
+    """Временно читает из основной базы внутри запроса на реплики."""
+    routing = database_routing.get()
+    if routing is None or not routing.replica:
+        yield
+        return
+    routing.replica = False
+    try:
+        yield
+    finally:
+        routing.replica = not routing.wrote
+
+
+@contextmanager
+def execute_wrappers(*wrappers):
+    """Включает обёртки execute_wrapper для SQL текущего контекста.
+
+    Обёртки хранятся в contextvar, а не на соединениях: под ASGI view
+    выполняется в другом потоке со своим соединением, и sync_to_async
+    переносит туда контекст вместе с обёртками.
+    """
+    token = request_execute_wrappers.set(
+        (*request_execute_wrappers.get(), *wrappers)
+    )
+    try:
+        yield
+    finally:
+        request_execute_wrappers.reset(token)
+
+
+def run_execute_wrappers(execute, sql, params, many, context):
+    """Обёртка, которая ставится на каждое соединение при его создании
+    и вызывает обёртки из execute_wrappers в порядке Django."""
+    connection = context['connection']
+    if getattr(connection, 'health_check_pending', False):
+        check_connection(connection, context['cursor'])
+    for wrapper in reversed(request_execute_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install_execute_wrappers(connection):
+    if run_execute_wrappers not in connection.execute_wrappers:
+        connection.execute_wrappers.append(run_execute_wrappers)
+
+
+def schedule_health_checks():
+    """Отмечает постоянные соединения для проверки в начале запроса.
+
+    Аналог CONN_HEALTH_CHECKS из Django 4.1: живое соединение
+    проверяется одним SELECT 1 перед первым SQL запроса, а не падает на
+    нём после перезапуска базы или обрыва сети. Запросы, которые не
+    обращаются к базе или к какому-то из её алиасов, проверку не платят.
+    """
+    for connection in connections.all():
+        connection.health_check_pending = bool(
+            connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and connection.connection is not None
+        )
+
+
+def check_connection(connection, cursor):
+    """Переподключается, если соединение перестало отвечать.
+
+    Курсор первого SQL уже создан на мёртвом соединении, поэтому его
+    DB-API курсор заменяется курсором нового соединения. Внутри atomic
+    закрыть соединение нельзя, не сломав транзакцию: там SQL идёт как
+    есть.
+    """
+    connection.health_check_pending = False
+    if connection.in_atomic_block or connection.is_usable():
+        return
+    connection.close()
+    connection.ensure_connection()
+    with connection.wrap_database_errors:
+        cursor.cursor = connection.create_cursor(
+            getattr(cursor.cursor, 'name', None)
+        )
+
+
+class StatementTimeout:
+    """Обёртка execute_wrapper: свой statement_timeout на время запроса.
+
+    SET выполняется перед первым SQL на каждом соединении PostgreSQL,
+    поэтому запросы без обращений к базе ничего не платят; 0 снимает
+    ограничение, RESET возвращает таймаут, заданный при подключении.
+    Для SET открывается отдельный курсор: первым запросом может
+    оказаться серверный курсор .iterator(), который выполняет только
+    один SQL.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        # (поток, алиас) -> None или колбэк on_commit, пока SET внутри
+        # незавершённой транзакции.
+        self.applied = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context['connection']
+        key = (get_ident(), connection.alias)
+        if (
+            self.timeout is not None
+            and connection.vendor == 'postgresql'
+            and not self.is_applied(connection, key)
+        ):
+            # Соединение отмечается заранее: SET проходит через эту же
+            # обёртку.
+            self.applied[key] = None
+            with connection.cursor() as cursor:
+                cursor.execute('SET statement_timeout = %s', [self.timeout])
+            if connection.in_atomic_block:
+                self.applied[key] = self.wait_for_commit(connection, key)
+        return execute(sql, params, many, context)
+
+    def wait_for_commit(self, connection, key):
+        def committed():
+            if key in self.applied:
+                self.applied[key] = None
+        transaction.on_commit(committed, using=connection.alias)
+        return committed
+
+    def is_applied(self, connection, key):
+        """Действует ли SET на соединении.
+
+        SET внутри atomic откатывается вместе с транзакцией или точкой
+        сохранения. Django в этих случаях выбрасывает колбэки on_commit,
+        так что пропавший колбэк означает, что SET нужно повторить.
+        """
+        if key not in self.applied:
+            return False
+        committed = self.applied[key]
+        if committed is None or any(
+            func is committed for _, func in connection.run_on_commit
+        ):
+            return True
+        del self.applied[key]
+        return False
+
+    def reset(self):
+        """Снимает таймаут с соединений текущего потока.
+
+        Под ASGI SQL одного запроса может идти в разных потоках, и
+        каждый поток сбрасывает только свои соединения.
+        """
+        thread = get_ident()
+        for key in [key for key in self.applied if key[0] == thread]:
+            connection = connections[key[1]]
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET statement_timeout')
+            except DatabaseError:
+                # Не оставляем в пуле соединение с чужим таймаутом.
+                connection.close()
+            finally:
+                # Только после RESET, иначе обёртка снова выставит SET.
+                self.applied.pop(key, None)
+
+
+class PrimaryReplicaRouter:
+    """Чтение с реплик в безопасных запросах, запись и миграции в default.
+
+    Какие запросы читают с реплик, решает ReplicaRoutingMiddleware
+    через database_routing; вне HTTP-запросов (команды, shell) всё
+    идёт в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = database_routing.get()
+        if routing and routing.replica and routing.replica_alias:
+            return routing.replica_alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        routing = database_routing.get()
+        if routing is not None:
+            routing.replica = False
+            routing.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -1,22 +1,33 @@
+from django.conf import settings
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
 from django_filters import CharFilter, FilterSet
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from recipes.search import search_recipes
 
 
 class RecipeFilter(FilterSet):
     tags = CharFilter(field_name='tags__slug', method='filter_tags')
     is_favorited = CharFilter(method='filter_is_favorited')
     is_in_shopping_cart = CharFilter(method='filter_is_in_shopping_cart')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags', 'search'
+        )
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def filter_tags(self, queryset, slug, tags):
         tags = self.request.query_params.getlist('tags')
-        return queryset.filter(
-            tags__slug__in=tags
-        ).distinct()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__slug__in=tags
+            )
+        ))
 
     def filter_is_favorited(self, queryset, is_favorited, slug):
         user = self.request.user
@@ -26,9 +37,9 @@ class RecipeFilter(FilterSet):
             'is_favorited',
         )
         if is_favorited:
-            return queryset.filter(
-                favorite__user=self.request.user
-            ).distinct()
+            return queryset.filter(Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, is_in_shopping_cart, slug):
@@ -39,15 +50,28 @@ class RecipeFilter(FilterSet):
             'is_in_shopping_cart',
         )
         if is_in_shopping_cart:
-            return queryset.filter(
-                cart__user=self.request.user
-            ).distinct()
+            return queryset.filter(Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ))
         return queryset
 
 
 class IngredientFilter(FilterSet):
-    name = CharFilter(field_name='name', lookup_expr='icontains')
+    name = CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+    def filter_name(self, queryset, name, value):
+        return queryset.filter(
+            name__icontains=value
+        ).annotate(
+            rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by(
+            'rank', 'name'
+        )[:settings.INGREDIENT_AUTOCOMPLETE_LIMIT]
@@ -0,0 +1,124 @@
+import asyncio
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import format_timings, timed
+from recipes.models import Recipe
+from users.models import User
+
+SCENARIOS = (
+    ('recipes', '/api/{prefix}recipes/', True),
+    ('recipe detail', '/api/{prefix}recipes/{recipe_id}/', True),
+    ('tags', '/api/{prefix}tags/', False),
+    ('ingredients: autocomplete', '/api/{prefix}ingredients/?name=сол', False),
+    ('subscriptions',
+     '/api/{prefix}users/subscriptions/?recipes_limit=3', True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность одного синхронного WSGI-воркера '
+        'и одного ASGI-воркера с эндпоинтами /api/async/ под '
+        'конкурентной нагрузкой. Данные готовит команда generate_dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--user-email', default='bench-user-0@example.com')
+        parser.add_argument(
+            '--db-latency', type=float, default=0,
+            help='Добавлять к каждому SQL-запросу задержку сети, мс.'
+        )
+
+    def add_latency(self, execute, sql, params, many, context):
+        sleep(self.db_latency / 1000)
+        return execute(sql, params, many, context)
+
+    def connection_created(self, sender, connection, **kwargs):
+        # Потоки ASGI открывают свои соединения, задержка ставится
+        # на каждое из них.
+        connection.execute_wrappers.append(self.add_latency)
+
+    def check(self, path, status):
+        if status != 200:
+            raise CommandError('GET {0}: {1}'.format(path, status))
+
+    def run_wsgi(self, path, authenticated):
+        # Синхронный воркер обрабатывает запросы строго по одному.
+        client = Client()
+        headers = {'HTTP_AUTHORIZATION': self.token} if authenticated else {}
+        self.check(path, client.get(path, **headers).status_code)
+        timings = []
+        started = perf_counter()
+        for _ in range(self.requests):
+            response, duration = timed(client.get, path, **headers)
+            self.check(path, response.status_code)
+            timings.append(duration)
+        return timings, perf_counter() - started
+
+    async def run_asgi(self, path, authenticated):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        # AsyncClient принимает заголовки без префикса HTTP_.
+        headers = {'authorization': self.token} if authenticated else {}
+
+        async def get():
+            async with semaphore:
+                request_started = perf_counter()
+                response = await client.get(path, **headers)
+                self.check(path, response.status_code)
+                return (perf_counter() - request_started) * 1000
+
+        await get()
+        started = perf_counter()
+        timings = await asyncio.gather(
+            *(get() for _ in range(self.requests))
+        )
+        return list(timings), perf_counter() - started
+
+    def report(self, label, timings, elapsed):
+        self.stdout.write('{0} {1:.1f} req/s'.format(
+            format_timings(label, timings), len(timings) / elapsed
+        ))
+
+    def handle(self, *args, **options):
+        self.requests = options['requests']
+        self.concurrency = options['concurrency']
+        user = User.objects.filter(email=options['user_email']).first()
+        recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+        if user is None or recipe is None:
+            raise CommandError(
+                'Нет пользователя {0} или рецептов, сначала выполните '
+                'generate_dataset.'.format(options['user_email'])
+            )
+        self.token = 'Token {0}'.format(
+            Token.objects.get_or_create(user=user)[0].key
+        )
+        self.db_latency = options['db_latency']
+        if self.db_latency:
+            connection.execute_wrappers.append(self.add_latency)
+            connection_created.connect(self.connection_created)
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            for label, path, authenticated in SCENARIOS:
+                self.report(f'{label}: wsgi', *self.run_wsgi(
+                    path.format(prefix='', recipe_id=recipe.id),
+                    authenticated
+                ))
+                self.report(
+                    f'{label}: asgi x{self.concurrency}',
+                    *asyncio.run(self.run_asgi(
+                        path.format(prefix='async/', recipe_id=recipe.id),
+                        authenticated
+                    ))
+                )
@@ -0,0 +1,49 @@
+import random
+
+from django.core.management import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from api.benchmarks import format_timings, timed
+from recipes.ingredient_index import reset_ingredient_index
+from recipes.models import Ingredient
+
+AUTOCOMPLETE_URL = '/api/ingredients/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку автодополнения ингредиентов на каждое нажатие '
+        'клавиши: поиск в БД и во внутрипроцессном индексе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def keystrokes(self, words, seed):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError(
+                'Нет ингредиентов: сначала загрузите данные.'
+            )
+        sample = random.Random(seed).sample(names, min(words, len(names)))
+        return [
+            name[:length]
+            for name in sample
+            for length in range(1, len(name) + 1)
+        ]
+
+    def handle(self, *args, **options):
+        queries = self.keystrokes(options['words'], options['seed'])
+        client = Client()
+        for use_index in (False, True):
+            reset_ingredient_index()
+            with override_settings(INGREDIENT_AUTOCOMPLETE_INDEX=use_index):
+                client.get(AUTOCOMPLETE_URL, {'name': queries[0]})
+                timings = [
+                    timed(client.get, AUTOCOMPLETE_URL, {'name': query})[1]
+                    for query in queries
+                ]
+            self.stdout.write(format_timings(
+                'index' if use_index else 'database', timings
+            ))
@@ -0,0 +1,75 @@
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from api.benchmarks import format_measurement, measure, percentile
+
+BENCH_PASSWORD = 'Bench-password-2024'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет хэширование паролей, регистрацию и вход: время, '
+        'число запросов и пропускную способность одного ядра.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def report(self, label, result):
+        throughput = 1000 / max(percentile(result['timings'], 50), 1e-6)
+        self.stdout.write('{0} ~{1:.1f} ops/s/core'.format(
+            format_measurement(label, result), throughput
+        ))
+
+    def benchmark_hashers(self, repeat):
+        for hasher in settings.PASSWORD_HASHERS[:2]:
+            name = hasher.rsplit('.', 1)[-1]
+            with override_settings(PASSWORD_HASHERS=[hasher]):
+                encoded = make_password(BENCH_PASSWORD)
+                self.report(f'{name}: hash', measure(
+                    lambda: make_password(BENCH_PASSWORD), repeat
+                ))
+                self.report(f'{name}: verify', measure(
+                    lambda: check_password(BENCH_PASSWORD, encoded), repeat
+                ))
+
+    def benchmark_requests(self, repeat):
+        client = Client()
+        numbers = count()
+
+        def signup():
+            number = next(numbers)
+            response = client.post('/api/users/', {
+                'email': f'bench-signup-{number}@example.com',
+                'username': f'bench-signup-{number}',
+                'first_name': 'Имя',
+                'last_name': 'Фамилия',
+                'password': BENCH_PASSWORD,
+            })
+            if response.status_code != 201:
+                raise CommandError(response.content.decode())
+
+        def login():
+            response = client.post('/api/auth/token/login/', {
+                'email': 'bench-signup-0@example.com',
+                'password': BENCH_PASSWORD,
+            })
+            if response.status_code != 200:
+                raise CommandError(response.content.decode())
+
+        self.report('signup', measure(signup, repeat))
+        self.report('login', measure(login, repeat))
+
+    def handle(self, *args, **options):
+        self.benchmark_hashers(options['repeat'])
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            with transaction.atomic():
+                self.benchmark_requests(options['repeat'])
+                transaction.set_rollback(True)
@@ -0,0 +1,121 @@
+import random
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.benchmarks import format_timings, timed
+from api.filters import RecipeFilter
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from users.models import User
+
+SCENARIOS = (
+    'tags=breakfast',
+    'tags=breakfast&tags=lunch',
+    'tags=breakfast&is_favorited=1',
+    'tags=breakfast&tags=dinner&is_favorited=1&is_in_shopping_cart=1',
+)
+TAG_SLUGS = ('breakfast', 'lunch', 'dinner')
+BATCH_SIZE = 5000
+
+
+def distinct_join_filter(queryset, params, user):
+    """Прежняя реализация RecipeFilter: JOIN по связям и DISTINCT."""
+    if 'tags' in params:
+        queryset = queryset.filter(
+            tags__slug__in=params.getlist('tags')
+        ).distinct()
+    if params.get('is_favorited'):
+        queryset = queryset.filter(favorite__user=user).distinct()
+    if params.get('is_in_shopping_cart'):
+        return queryset.filter(cart__user=user).distinct()
+    return queryset
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает фильтрацию рецептов через JOIN + DISTINCT и через '
+        'EXISTS на синтетических данных. Данные удаляются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--explain', action='store_true')
+
+    def generate(self, recipes_count, seed):
+        rng = random.Random(seed)
+        user = User.objects.create(
+            email='bench-filters@example.com', username='bench-filters'
+        )
+        tags = [
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': f'bench-{slug}', 'color': '#000'}
+            )[0]
+            for slug in TAG_SLUGS
+        ]
+        through = Recipe.tags.through
+        for start in range(0, recipes_count, BATCH_SIZE):
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    author=user, name=f'Рецепт {number}',
+                    image='recipes/bench.jpg', text='Описание',
+                    cooking_time=rng.randint(1, 120)
+                )
+                for number in range(
+                    start, min(start + BATCH_SIZE, recipes_count)
+                )
+            ])
+            if recipes[0].pk is None:
+                recipes = list(Recipe.objects.filter(
+                    author=user
+                ).order_by('-id')[:len(recipes)])
+            through.objects.bulk_create([
+                through(recipe_id=recipe.pk, tag_id=tag.pk)
+                for recipe in recipes
+                for tag in rng.sample(tags, rng.randint(1, 2))
+            ])
+            Favorite.objects.bulk_create([
+                Favorite(user=user, recipe=recipe)
+                for recipe in recipes if rng.random() < 0.1
+            ])
+            ShoppingCart.objects.bulk_create([
+                ShoppingCart(user=user, recipe=recipe)
+                for recipe in recipes if rng.random() < 0.05
+            ])
+        return user
+
+    def measure(self, label, queryset, repeat, explain):
+        def run():
+            queryset.count()
+            return list(queryset.values_list('id', flat=True)[:9])
+        timings = [timed(run)[1] for _ in range(repeat)]
+        self.stdout.write('  ' + format_timings(label, timings))
+        if explain:
+            self.stdout.write(queryset.explain())
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        with transaction.atomic():
+            user = self.generate(options['recipes'], options['seed'])
+            for scenario in SCENARIOS:
+                params = QueryDict(scenario)
+                request = Request(factory.get('/api/recipes/', params))
+                request.user = user
+                self.stdout.write(scenario)
+                self.measure(
+                    'distinct',
+                    distinct_join_filter(Recipe.objects.all(), params, user),
+                    options['repeat'], options['explain']
+                )
+                self.measure(
+                    'exists',
+                    RecipeFilter(
+                        params, queryset=Recipe.objects.all(), request=request
+                    ).qs,
+                    options['repeat'], options['explain']
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,56 @@
+from time import process_time
+
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+
+from api.benchmarks import format_measurement, measure, percentile
+from api.serializers import RecipeReadSerializer
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет сериализацию страницы рецептов без кэша фрагментов '
+        '(как раньше) и с прогретым кэшем: время, процессорное время, '
+        'число запросов и пик памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=9)
+        parser.add_argument('--user-email', default='bench-user-0@example.com')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['user_email']).first()
+        if user is None:
+            raise CommandError(
+                'Пользователь {0} не найден, сначала выполните '
+                'generate_dataset.'.format(options['user_email'])
+            )
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        context = {'request': request, 'image_rendition': 'card'}
+        queryset = Recipe.objects.with_user_flags(user).order_by(
+            *Recipe._meta.ordering
+        )[:options['page_size']]
+
+        def serialize_page():
+            started = process_time()
+            RecipeReadSerializer(
+                queryset.all(), many=True, context=context
+            ).data
+            cpu_timings.append((process_time() - started) * 1000)
+
+        for label, timeout in (('without fragments', 0), ('fragments', 60)):
+            cache.clear()
+            cpu_timings = []
+            with override_settings(RECIPE_FRAGMENT_CACHE_TIMEOUT=timeout):
+                result = measure(serialize_page, options['repeat'])
+            self.stdout.write('{0} cpu_p50={1:.2f}ms'.format(
+                format_measurement(
+                    f'page of {options["page_size"]}: {label}', result
+                ),
+                percentile(cpu_timings, 50)
+            ))
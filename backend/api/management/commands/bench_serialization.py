@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks import format_measurement, measure
+from api.renderers import FastJSONRenderer
+from api.serializers import IngredientSerializer, TagSerializer
+from recipes.models import Ingredient, Tag
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает сериализацию справочников через объекты моделей и '
+        'через values(), а также рендеринг stdlib json и FastJSONRenderer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def report(self, label, function, repeat):
+        self.stdout.write(format_measurement(label, measure(function, repeat)))
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        for name, serializer_class, model in (
+            ('ingredients', IngredientSerializer, Ingredient),
+            ('tags', TagSerializer, Tag),
+        ):
+            # Список объектов идёт обычным путём ModelSerializer.
+            self.report(f'{name}: model objects', lambda: serializer_class(
+                list(model.objects.all()), many=True
+            ).data, repeat)
+            self.report(f'{name}: values', lambda: serializer_class(
+                model.objects.all(), many=True
+            ).data, repeat)
+            data = serializer_class(model.objects.all(), many=True).data
+            for renderer in (JSONRenderer(), FastJSONRenderer()):
+                self.report(
+                    f'{name}: render {type(renderer).__name__}',
+                    lambda: renderer.render(data), repeat
+                )
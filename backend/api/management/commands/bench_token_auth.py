@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CachedTokenAuthentication
+from api.benchmarks import format_measurement, measure
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает TokenAuthentication и CachedTokenAuthentication: '
+        'время и число SQL-запросов на одну аутентификацию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--user-email', default='bench-user-0@example.com')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['user_email']).first()
+        if user is None:
+            raise CommandError(
+                'Пользователь {0} не найден, сначала выполните '
+                'generate_dataset.'.format(options['user_email'])
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        request = RequestFactory().get(
+            '/api/recipes/', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        cache.clear()
+        for label, authentication in (
+            ('TokenAuthentication', TokenAuthentication()),
+            ('CachedTokenAuthentication', CachedTokenAuthentication()),
+        ):
+            self.stdout.write(format_measurement(label, measure(
+                lambda: authentication.authenticate(request),
+                options['repeat']
+            )))
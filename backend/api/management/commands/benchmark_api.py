@@ -0,0 +1,146 @@
+import base64
+import io
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import format_measurement, measure
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+READ_SCENARIOS = (
+    ('recipes: anonymous', '/api/recipes/', False),
+    ('recipes: authenticated', '/api/recipes/', True),
+    ('recipes: page 50', '/api/recipes/?page=50', True),
+    ('recipes: cursor', '/api/recipes/?cursor=', True),
+    ('recipes: tags', '/api/recipes/?tags=breakfast&tags=dinner', True),
+    ('recipes: favorited', '/api/recipes/?is_favorited=1', True),
+    ('recipes: in cart', '/api/recipes/?is_in_shopping_cart=1', True),
+    ('recipes: search', '/api/recipes/?search=суп', True),
+    ('recipe detail', '/api/recipes/{recipe_id}/', True),
+    ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+    ('tags', '/api/tags/', False),
+    ('ingredients: autocomplete', '/api/ingredients/?name=сол', False),
+    ('shopping cart: txt',
+     '/api/recipes/download_shopping_cart/?format=txt', True),
+    ('shopping cart: csv',
+     '/api/recipes/download_shopping_cart/?format=csv', True),
+    ('shopping cart: pdf',
+     '/api/recipes/download_shopping_cart/?format=pdf', True),
+)
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), '#49b64e').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные эндпоинты API через тестовый клиент Django '
+        'и выводит перцентили задержки, число запросов и пик памяти. '
+        'Данные готовит команда generate_dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--user-email', default='bench-user-0@example.com')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--skip-writes', action='store_true',
+            help='Не замерять создание и изменение рецептов.'
+        )
+
+    def request(self, method, path, authenticated, expected, **kwargs):
+        headers = self.auth_headers if authenticated else {}
+
+        def call():
+            if self.cold:
+                cache.clear()
+            response = getattr(self.client, method)(path, **headers, **kwargs)
+            if response.status_code != expected:
+                raise CommandError('{0} {1}: {2} {3}'.format(
+                    method.upper(), path, response.status_code,
+                    response.content[:500] if not response.streaming else ''
+                ))
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+        return call
+
+    def report(self, label, function):
+        self.stdout.write(
+            format_measurement(label, measure(function, self.repeat))
+        )
+
+    def recipe_payload(self):
+        return {
+            'name': 'Замерочный рецепт',
+            'text': 'Описание',
+            'cooking_time': 30,
+            'image': self.image,
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in Ingredient.objects.order_by(
+                    'id'
+                ).values_list('id', flat=True)[:8]
+            ],
+        }
+
+    def benchmark_writes(self):
+        payload = self.recipe_payload()
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                with transaction.atomic():
+                    self.report('recipe create', self.request(
+                        'post', '/api/recipes/', True, 201,
+                        data=payload, content_type='application/json'
+                    ))
+                    recipe = Recipe.objects.filter(
+                        author=self.user
+                    ).order_by('-id').first()
+                    payload['ingredients'] = payload['ingredients'][::2]
+                    self.report('recipe update', self.request(
+                        'patch', f'/api/recipes/{recipe.id}/', True, 200,
+                        data=payload, content_type='application/json'
+                    ))
+                    transaction.set_rollback(True)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.cold = options['cold']
+        self.user = User.objects.filter(email=options['user_email']).first()
+        if self.user is None:
+            raise CommandError(
+                'Пользователь {0} не найден, сначала выполните '
+                'generate_dataset.'.format(options['user_email'])
+            )
+        recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+        if recipe is None:
+            raise CommandError('Нет рецептов, выполните generate_dataset.')
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.auth_headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        self.image = make_image()
+        self.client = Client()
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            for label, path, authenticated in READ_SCENARIOS:
+                self.report(label, self.request(
+                    'get', path.format(recipe_id=recipe.id), authenticated, 200
+                ))
+            if not options['skip_writes']:
+                self.benchmark_writes()
@@ -0,0 +1,353 @@
+import asyncio
+import json
+import logging
+import random
+from collections import Counter
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .authentication import get_token_digest
+from .db import (DatabaseRouting, StatementTimeout, database_routing,
+                 execute_wrappers)
+from .response_cache import count
+
+logger = logging.getLogger('api.request_metrics')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REQUEST_METRICS_ENDPOINTS_KEY = 'request_metrics:endpoints'
+REQUEST_METRICS_KEY = 'request_metrics:{endpoint}:{name}'
+REQUEST_METRICS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+REQUEST_METRICS_COUNTERS = ('count', 'total_us', 'db_us', 'queries')
+DUPLICATE_SQL_LENGTH = 200
+PRIMARY_PIN_KEY = 'db_primary_pin:{digest}'
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: считает запросы, их время и повторы.
+
+    Повторы ищутся по тексту SQL без параметров, поэтому одинаковые
+    запросы к разным объектам (типичный N+1) попадают в одну группу.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return self.count - len(self.statements)
+
+    def most_duplicated(self):
+        if not self.duplicates:
+            return None
+        sql, repeats = self.statements.most_common(1)[0]
+        return {'sql': sql[:DUPLICATE_SQL_LENGTH], 'count': repeats}
+
+
+def get_bucket(duration_ms):
+    for bound in REQUEST_METRICS_BUCKETS:
+        if duration_ms <= bound:
+            return 'le_{0}'.format(bound)
+    return 'le_inf'
+
+
+def get_metric_key(endpoint, name):
+    return REQUEST_METRICS_KEY.format(
+        endpoint=endpoint.replace(' ', ':'), name=name
+    )
+
+
+class EndpointRegistry:
+    """Список эндпоинтов с метриками, общий для всех процессов."""
+
+    def __init__(self):
+        self.known = set()
+
+    def register(self, endpoint):
+        if endpoint in self.known:
+            return
+        endpoints = cache.get(REQUEST_METRICS_ENDPOINTS_KEY, [])
+        if endpoint not in endpoints:
+            cache.set(
+                REQUEST_METRICS_ENDPOINTS_KEY, [*endpoints, endpoint], None
+            )
+        self.known.add(endpoint)
+
+    def all(self):
+        return cache.get(REQUEST_METRICS_ENDPOINTS_KEY, [])
+
+
+endpoint_registry = EndpointRegistry()
+
+
+def record_request_metrics(endpoint, total_ms, recorder):
+    endpoint_registry.register(endpoint)
+    count(get_metric_key(endpoint, 'count'))
+    count(get_metric_key(endpoint, 'total_us'), int(total_ms * 1000))
+    count(get_metric_key(endpoint, 'db_us'), int(recorder.duration * 10**6))
+    count(get_metric_key(endpoint, 'queries'), recorder.count)
+    count(get_metric_key(endpoint, get_bucket(total_ms)))
+
+
+def get_request_metrics():
+    """Сводка по эндпоинтам: средние значения и гистограмма задержек."""
+    buckets = [
+        'le_{0}'.format(bound) for bound in REQUEST_METRICS_BUCKETS
+    ] + ['le_inf']
+    endpoints = endpoint_registry.all()
+    values = cache.get_many([
+        get_metric_key(endpoint, name)
+        for endpoint in endpoints
+        for name in (*REQUEST_METRICS_COUNTERS, *buckets)
+    ])
+    metrics = {}
+    for endpoint in endpoints:
+        def value(name):
+            return values.get(get_metric_key(endpoint, name), 0)
+        requests = value('count') or 1
+        metrics[endpoint] = {
+            'count': value('count'),
+            'avg_ms': round(value('total_us') / requests / 1000, 2),
+            'avg_db_ms': round(value('db_us') / requests / 1000, 2),
+            'avg_queries': round(value('queries') / requests, 2),
+            'histogram_ms': {bucket: value(bucket) for bucket in buckets},
+        }
+    return metrics
+
+
+class HybridMiddleware:
+    """Основа middleware, работающих и под WSGI, и под ASGI.
+
+    Наследники реализуют call и acall. Под ASGI запросы к базе идут не
+    в event loop, а в потоках view, поэтому обёртки SQL включаются
+    через api.db.execute_wrappers: контекст с ними попадает в поток
+    вместе с вызовом sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Так Django 3.2 распознаёт асинхронный middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    """Замеряет SQL и время обработки для доли запросов.
+
+    Доля задаётся REQUEST_METRICS_SAMPLE_RATE; для остальных запросов
+    middleware ничего не делает. Результат попадает в заголовок
+    Server-Timing, в лог api.request_metrics и в сводку /api/metrics/.
+    Время view включает сериализацию: DRF вызывает serializer.data
+    внутри view, поэтому отдельно показывается время view без SQL.
+    """
+
+    @staticmethod
+    def sampled():
+        sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        return bool(sample_rate) and random.random() < sample_rate
+
+    def call(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request.request_metrics = {}
+        started = perf_counter()
+        with execute_wrappers(recorder):
+            response = self.get_response(request)
+        total_ms = (perf_counter() - started) * 1000
+        self.report(request, response, recorder, total_ms)
+        return response
+
+    async def acall(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        request.request_metrics = {}
+        started = perf_counter()
+        with execute_wrappers(recorder):
+            response = await self.get_response(request)
+        total_ms = (perf_counter() - started) * 1000
+        self.report(request, response, recorder, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'request_metrics'):
+            request.request_metrics['view_started'] = perf_counter()
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, 'request_metrics', None)
+        if metrics is None:
+            return response
+        metrics['render_started'] = perf_counter()
+
+        def rendered(response):
+            metrics['render_finished'] = perf_counter()
+        response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, recorder, total_ms):
+        metrics = request.request_metrics
+        db_ms = recorder.duration * 1000
+        timings = [('db', db_ms, '{0} queries, {1} duplicates'.format(
+            recorder.count, recorder.duplicates
+        ))]
+        if 'view_started' in metrics and 'render_started' in metrics:
+            view_ms = (
+                metrics['render_started'] - metrics['view_started']
+            ) * 1000
+            timings.append(('view', view_ms, 'view and serializers'))
+            timings.append(
+                ('app', max(view_ms - db_ms, 0), 'view without SQL')
+            )
+        if 'render_finished' in metrics:
+            timings.append(('render', (
+                metrics['render_finished'] - metrics['render_started']
+            ) * 1000, 'renderer'))
+        timings.append(('total', total_ms, None))
+        response['Server-Timing'] = ', '.join(
+            '{0};dur={1:.2f}'.format(name, duration)
+            + (';desc="{0}"'.format(description) if description else '')
+            for name, duration, description in timings
+        )
+        match = request.resolver_match
+        endpoint = '{0} {1}'.format(
+            request.method, match.view_name if match else 'unresolved'
+        )
+        if match:
+            record_request_metrics(endpoint, total_ms, recorder)
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'duplicates': recorder.duplicates,
+            'most_duplicated': recorder.most_duplicated(),
+            **{
+                '{0}_ms'.format(name): round(duration, 2)
+                for name, duration, _ in timings
+            },
+        }, ensure_ascii=False))
+
+
+class StatementTimeoutMiddleware(HybridMiddleware):
+    """Меняет таймаут SQL для эндпоинтов из DB_STATEMENT_TIMEOUTS.
+
+    Общий DB_STATEMENT_TIMEOUT задаётся соединению при подключении и
+    ничего не стоит запросам. SET и RESET выполняются только во view с
+    собственным таймаутом; после ответа у соединения снова таймаут по
+    умолчанию. За PgBouncer в режиме transaction SET на сессию не
+    работает, поэтому при DB_PGBOUNCER middleware ничего не делает.
+    """
+
+    @staticmethod
+    def enabled():
+        return bool(settings.DB_STATEMENT_TIMEOUTS) and not (
+            settings.DB_PGBOUNCER
+        )
+
+    def call(self, request):
+        if not self.enabled():
+            return self.get_response(request)
+        request.statement_timeout = StatementTimeout()
+        try:
+            with execute_wrappers(request.statement_timeout):
+                return self.get_response(request)
+        finally:
+            request.statement_timeout.reset()
+
+    async def acall(self, request):
+        if not self.enabled():
+            return await self.get_response(request)
+        statement_timeout = request.statement_timeout = StatementTimeout()
+        try:
+            with execute_wrappers(statement_timeout):
+                return await self.get_response(request)
+        finally:
+            # Синхронные view под ASGI работают в потоке thread_sensitive;
+            # таймаут в потоках async-view снимает call_view.
+            if statement_timeout.applied:
+                await sync_to_async(
+                    statement_timeout.reset, thread_sensitive=True
+                )()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        statement_timeout = getattr(request, 'statement_timeout', None)
+        if statement_timeout is None:
+            return
+        timeout = settings.DB_STATEMENT_TIMEOUTS.get(
+            request.resolver_match.url_name
+        )
+        if timeout != settings.DB_STATEMENT_TIMEOUT:
+            statement_timeout.timeout = timeout
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """Отправляет чтение безопасных запросов на реплики.
+
+    После записи клиент на DB_REPLICA_PIN_TIMEOUT секунд закрепляется
+    за основной базой и читает свои изменения, пока реплика догоняет.
+    Клиент определяется по токену из заголовка Authorization.
+    """
+
+    @staticmethod
+    def get_pin_key(request):
+        keyword, _, key = request.META.get(
+            'HTTP_AUTHORIZATION', ''
+        ).partition(' ')
+        if keyword.lower() != 'token' or not key.strip():
+            return None
+        return PRIMARY_PIN_KEY.format(digest=get_token_digest(key.strip()))
+
+    def start(self, request):
+        pin_key = self.get_pin_key(request)
+        routing = DatabaseRouting(
+            request.method in SAFE_METHODS
+            and not (pin_key and cache.get(pin_key))
+        )
+        return pin_key, routing, database_routing.set(routing)
+
+    def finish(self, request, pin_key, routing, token):
+        database_routing.reset(token)
+        if pin_key and (routing.wrote or request.method not in SAFE_METHODS):
+            cache.set(pin_key, True, settings.DB_REPLICA_PIN_TIMEOUT)
+
+    def call(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        state = self.start(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(request, *state)
+
+    async def acall(self, request):
+        # sync_to_async копирует контекст в поток вместе с routing.
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        state = self.start(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(request, *state)
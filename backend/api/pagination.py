@@ -1,6 +1,97 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+INVALID_CURSOR_ERROR = 'Некорректный курсор.'
 
 
 class FoodPagination(PageNumberPagination):
     page_size = 9
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по курсору без OFFSET и COUNT(*).
+
+    Курсор хранит значения полей сортировки последнего элемента страницы,
+    следующая страница выбирается условием по этим полям. Сортировка
+    должна быть уникальной, поэтому последним полем идёт id.
+    """
+    page_size = 9
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-pub_date', '-id')
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None or not page_size.isdigit():
+            return self.page_size
+        return min(int(page_size), self.max_page_size) or self.page_size
+
+    def encode_cursor(self, item):
+        values = [
+            str(getattr(item, field.lstrip('-'))) for field in self.ordering
+        ]
+        return base64.urlsafe_b64encode(
+            json.dumps(values).encode()
+        ).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(INVALID_CURSOR_ERROR)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(INVALID_CURSOR_ERROR)
+        return values
+
+    def get_keyset_filter(self, values):
+        keyset = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            keyset |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return keyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(
+                    self.get_keyset_filter(self.decode_cursor(cursor))
+                )
+            except (DjangoValidationError, ValueError):
+                raise NotFound(INVALID_CURSOR_ERROR)
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            ),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
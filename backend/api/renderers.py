@@ -0,0 +1,306 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .truetype import TrueTypeFont
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SHOPPING_CART_TITLE = 'Список покупок'
+SHOPPING_CART_LINE_FORMAT = '{name}, {measurement_unit}: {total}'
+SHOPPING_CART_CSV_HEADER = ('name', 'measurement_unit', 'total')
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 12
+PDF_LEADING = 16
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_ENCODING = 'cp1251'
+PDF_FIRST_CHAR = 32
+PDF_LAST_CHAR = 255
+# Байты cp1251 с буквами Ё, ё, А-Я, а-я; остальные коды шрифт берёт из
+# WinAnsiEncoding (cp1252).
+PDF_CYRILLIC_CODES = frozenset((168, 184, *range(192, 256)))
+# Имена глифов кириллицы для этих байтов.
+PDF_CYRILLIC_DIFFERENCES = (
+    '168 /afii10023 184 /afii10071 192 '
+    + ' '.join(
+        '/afii{0}'.format(code)
+        for code in [*range(10017, 10023), *range(10024, 10050),
+                     *range(10065, 10071), *range(10072, 10098)]
+    )
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson, если он установлен.
+
+    Вывод совпадает с JSONRenderer: даты и прочие типы, которых нет в
+    JSON, orjson передаёт кодировщику DRF. Ответы с отступами (запрос
+    с indent в Accept) и окружение без orjson обслуживает stdlib json.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(
+            accepted_media_type or '', renderer_context or {}
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        ret = orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME
+        )
+        # Как и JSONRenderer, экранируем разделители строк для JavaScript.
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+
+def get_pdf_char(code):
+    """Символ, который PDF-шрифт рисует для байта code."""
+    encoding = PDF_ENCODING if code in PDF_CYRILLIC_CODES else 'cp1252'
+    return bytes((code,)).decode(encoding, errors='ignore')
+
+
+@lru_cache(maxsize=None)
+def get_pdf_font(path):
+    """TrueType-шрифт для PDF или None, если файла нет.
+
+    Без встроенного шрифта остаётся стандартный Helvetica, в котором
+    нет кириллицы: многие программы покажут русский текст пустым.
+    """
+    if not path or not Path(path).is_file():
+        return None
+    return TrueTypeFont(path)
+
+
+class ShoppingCartRenderer(ABC, BaseRenderer):
+    """Базовый рендерер выгрузки списка покупок.
+
+    Сам файл отдаётся потоково через stream(), а render() нужен DRF
+    только для ответов с ошибками.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    @abstractmethod
+    def stream(self, rows):
+        """Итератор байтов файла по строкам списка покупок."""
+
+    def get_filename(self):
+        return 'shopping_cart.{0}'.format(self.format)
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield '{0}\n\n'.format(SHOPPING_CART_TITLE).encode(self.charset)
+        for row in rows:
+            yield '\t{0}\n'.format(
+                SHOPPING_CART_LINE_FORMAT.format(**row)
+            ).encode(self.charset)
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(SHOPPING_CART_CSV_HEADER).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(
+                [row[field] for field in SHOPPING_CART_CSV_HEADER]
+            ).encode(self.charset)
+
+
+class PDFStreamWriter:
+    """Пишет PDF по одной странице за раз.
+
+    В памяти держатся только строки текущей страницы и смещения уже
+    записанных объектов, необходимые для таблицы xref в конце файла.
+    Если передан TrueType-шрифт, он встраивается в файл.
+    """
+    catalog_id = 1
+    pages_id = 2
+    font_id = 3
+
+    def __init__(self, font=None):
+        self.font = font
+        self.offsets = {}
+        self.position = 0
+        self.next_id = self.font_id + 1
+        self.page_ids = []
+
+    def write(self, data):
+        self.position += len(data)
+        return data
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        return self.write(
+            b'%d 0 obj\n' % object_id + body + b'\nendobj\n'
+        )
+
+    def allocate_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def header(self):
+        yield self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield self.write_object(
+            self.catalog_id,
+            b'<< /Type /Catalog /Pages %d 0 R >>' % self.pages_id
+        )
+        encoding = (
+            b'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+            b'/Differences [' + PDF_CYRILLIC_DIFFERENCES.encode() + b'] >>'
+        )
+        if self.font is None:
+            yield self.write_object(
+                self.font_id,
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                + encoding + b' >>'
+            )
+            return
+        yield from self.truetype_font(encoding)
+
+    def truetype_font(self, encoding):
+        font = self.font
+        name = font.name.encode()
+        descriptor_id = self.allocate_id()
+        file_id = self.allocate_id()
+        widths = b' '.join(
+            b'%d' % font.width(get_pdf_char(code))
+            for code in range(PDF_FIRST_CHAR, PDF_LAST_CHAR + 1)
+        )
+        yield self.write_object(
+            self.font_id,
+            b'<< /Type /Font /Subtype /TrueType /BaseFont /' + name
+            + b' /FirstChar %d /LastChar %d /Widths [' % (
+                PDF_FIRST_CHAR, PDF_LAST_CHAR
+            ) + widths + b'] /FontDescriptor %d 0 R ' % descriptor_id
+            + encoding + b' >>'
+        )
+        # Flags 32: несимвольный шрифт, глифы ищутся по именам из
+        # Encoding через Unicode-таблицу cmap.
+        yield self.write_object(
+            descriptor_id,
+            b'<< /Type /FontDescriptor /FontName /' + name
+            + b' /Flags 32 /FontBBox [%d %d %d %d] /ItalicAngle %d '
+            b'/Ascent %d /Descent %d /CapHeight %d /StemV 80 '
+            b'/FontFile2 %d 0 R >>' % (
+                *font.bbox, font.italic_angle, font.ascent, font.descent,
+                font.cap_height, file_id
+            )
+        )
+        yield self.write_object(
+            file_id,
+            b'<< /Length %d /Length1 %d /Filter /FlateDecode >>\nstream\n' % (
+                len(font.compressed), len(font.data)
+            ) + font.compressed + b'\nendstream'
+        )
+
+    @staticmethod
+    def escape(line):
+        return line.encode(PDF_ENCODING, errors='replace').replace(
+            b'\\', b'\\\\'
+        ).replace(b'(', b'\\(').replace(b')', b'\\)')
+
+    def page(self, lines):
+        content = b'BT /F1 %d Tf %d TL %d %d Td ' % (
+            PDF_FONT_SIZE, PDF_LEADING,
+            PDF_MARGIN, PDF_PAGE_HEIGHT - PDF_MARGIN
+        ) + b' T* '.join(
+            b'(' + self.escape(line) + b') Tj' for line in lines
+        ) + b' ET'
+        content_id = self.allocate_id()
+        page_id = self.allocate_id()
+        self.page_ids.append(page_id)
+        yield self.write_object(
+            content_id,
+            b'<< /Length %d >>\nstream\n' % len(content)
+            + content + b'\nendstream'
+        )
+        yield self.write_object(
+            page_id,
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>' % (
+                self.pages_id, PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT,
+                self.font_id, content_id
+            )
+        )
+
+    def trailer(self):
+        yield self.write_object(
+            self.pages_id,
+            b'<< /Type /Pages /Kids [' + b' '.join(
+                b'%d 0 R' % page_id for page_id in self.page_ids
+            ) + b'] /Count %d >>' % len(self.page_ids)
+        )
+        xref_position = self.position
+        yield self.write(
+            b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id
+        )
+        for object_id in range(1, self.next_id):
+            yield self.write(b'%010d 00000 n \n' % self.offsets[object_id])
+        yield self.write(
+            b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (self.next_id, self.catalog_id, xref_position)
+        )
+
+    def stream(self, lines):
+        yield from self.header()
+        page = []
+        for line in lines:
+            page.append(line)
+            if len(page) == PDF_LINES_PER_PAGE:
+                yield from self.page(page)
+                page = []
+        if page or not self.page_ids:
+            yield from self.page(page)
+        yield from self.trailer()
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode()
+
+    def stream(self, rows):
+        font = get_pdf_font(settings.SHOPPING_CART_PDF_FONT)
+        return PDFStreamWriter(font).stream(chain(
+            (SHOPPING_CART_TITLE, ''),
+            (SHOPPING_CART_LINE_FORMAT.format(**row) for row in rows)
+        ))
@@ -0,0 +1,84 @@
+from functools import wraps
+from hashlib import sha256
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from recipes.versions import get_content_generation
+
+from .db import use_primary
+
+RESPONSE_CACHE_KEY = 'recipe_response:{generation}:{digest}'
+RESPONSE_CACHE_HITS_KEY = 'recipe_response_cache:hits'
+RESPONSE_CACHE_MISSES_KEY = 'recipe_response_cache:misses'
+
+
+def normalize_query(query_params):
+    return urlencode(sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+    ))
+
+
+def get_response_cache_key(request):
+    """Ключ ответа: поколение и хэш адреса вместе со схемой и хостом.
+
+    В ответе абсолютные ссылки на изображения, построенные по Host
+    запроса, поэтому ответы разным хостам кэшируются отдельно. Хэш
+    держит длину ключа в пределах 250 символов memcached.
+    """
+    location = '{scheme}://{host}{path}?{query}'.format(
+        scheme=request.scheme,
+        host=request.get_host(),
+        path=request.path,
+        query=normalize_query(request.query_params)
+    )
+    return RESPONSE_CACHE_KEY.format(
+        generation=get_content_generation(),
+        digest=sha256(location.encode()).hexdigest()
+    )
+
+
+def count(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, delta, None)
+
+
+def get_response_cache_stats():
+    stats = cache.get_many(
+        (RESPONSE_CACHE_HITS_KEY, RESPONSE_CACHE_MISSES_KEY)
+    )
+    return {
+        'hits': stats.get(RESPONSE_CACHE_HITS_KEY, 0),
+        'misses': stats.get(RESPONSE_CACHE_MISSES_KEY, 0),
+    }
+
+
+def cache_anonymous_response(view):
+    """Кэширует ответы анонимным пользователям до смены поколения.
+
+    Промах читает из основной базы, иначе ответ с отстающей реплики
+    попал бы в кэш под ключом нового поколения.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+        if not timeout or not request.user.is_anonymous:
+            return view(request, *args, **kwargs)
+        key = get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            count(RESPONSE_CACHE_HITS_KEY)
+            return Response(data)
+        count(RESPONSE_CACHE_MISSES_KEY)
+        with use_primary():
+            response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        return response
+    return wrapper
@@ -1,12 +1,63 @@
-from django.shortcuts import get_object_or_404
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
-from users.models import User
+from recipes.shopping_cart import invalidate_recipe_shopping_carts
+from users.models import Subscribe, User
 
 INGREDIENTS_COUNT_ERROR = 'Количество ингредиента в рецепте не может быть <=1'
 INGREDIENT_REPETITION_ERROR = 'Ингредиенты не могут повторяться'
+INGREDIENT_DOES_NOT_EXIST_ERROR = 'Ингредиенты не найдены: {0}'
+BATCH_EMPTY_ERROR = 'Передайте id в add или remove.'
+BATCH_CONFLICT_ERROR = 'id не могут быть одновременно в add и remove: {0}'
+RECIPE_FRAGMENT_CACHE_KEY = 'recipe_fragment:{recipe_id}:{version}'
+RECIPE_READ_FIELDS = (
+    'id', 'tags', 'author', 'ingredients', 'is_favorited',
+    'is_in_shopping_cart', 'name', 'image', 'images', 'text', 'cooking_time'
+)
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """Список, который строится из строк .values() без объектов моделей.
+
+    QuerySet читается через values(child.values_fields), а каждая строка
+    (как и готовые словари в списке) отдаётся row_to_representation.
+    Объекты моделей и связанные менеджеры сериализуются как обычно.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            # Связанные объекты обычно уже загружены через prefetch.
+            return super().to_representation(data)
+        if isinstance(data, models.QuerySet):
+            data = data.values(*self.child.values_fields)
+        return [
+            self.child.row_to_representation(item)
+            if isinstance(item, dict)
+            else self.child.to_representation(item)
+            for item in data
+        ]
+
+
+class ValuesSerializerMixin:
+    """Быстрый путь ValuesListSerializer для простых полей модели.
+
+    По умолчанию поля берутся из строки как есть; сериализаторы с
+    вычисляемыми полями переопределяют row_to_representation.
+    """
+
+    @property
+    def values_fields(self):
+        return self.Meta.fields
+
+    def row_to_representation(self, row):
+        return OrderedDict((field, row[field]) for field in self.Meta.fields)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -31,10 +82,12 @@ class UserSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return obj.following.filter(user=request.user).exists()
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Tag
@@ -44,9 +97,11 @@ class TagSerializer(serializers.ModelSerializer):
             'color',
             'slug'
         )
+        list_serializer_class = ValuesListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ValuesSerializerMixin,
+                           serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
@@ -55,9 +110,62 @@ class IngredientSerializer(serializers.ModelSerializer):
             'name',
             'measurement_unit'
         )
+        list_serializer_class = ValuesListSerializer
+
+
+class RecipeImageField(serializers.Field):
+    """Ссылка на уменьшенную копию изображения рецепта в JPEG.
+
+    Пока копии не построены, отдаётся исходное изображение. Размер
+    можно переопределить через image_rendition в контексте.
+    """
 
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def build_url(self, path):
+        url = default_storage.url(path)
+        request = self.context.get('request')
+        if request is None:
+            return url
+        return request.build_absolute_uri(url)
+
+    def represent(self, image, renditions):
+        rendition = self.context.get('image_rendition', self.rendition)
+        path = renditions.get(rendition, {}).get('jpeg')
+        return self.build_url(path or image)
+
+    def to_representation(self, recipe):
+        return self.represent(recipe.image.name, recipe.image_renditions)
+
+
+class RecipeImagesField(RecipeImageField):
+    """Все уменьшенные копии изображения: размер -> формат -> ссылка."""
+
+    def __init__(self, **kwargs):
+        super().__init__(rendition=None, **kwargs)
+
+    def represent(self, image, renditions):
+        return {
+            rendition: {
+                extension: self.build_url(path)
+                for extension, path in paths.items()
+            }
+            for rendition, paths in renditions.items()
+            if rendition != 'source'
+        }
 
-class RecipeCutSerializer(serializers.ModelSerializer):
+
+class RecipeCutSerializer(ValuesSerializerMixin,
+                          serializers.ModelSerializer):
+    image = RecipeImageField(rendition='card')
+    images = RecipeImagesField()
+    values_fields = (
+        'id', 'name', 'image', 'image_renditions', 'cooking_time'
+    )
 
     class Meta:
         model = Recipe
@@ -65,17 +173,29 @@ class RecipeCutSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'images',
             'cooking_time'
         )
+        list_serializer_class = ValuesListSerializer
+
+    def row_to_representation(self, row):
+        return OrderedDict((
+            ('id', row['id']),
+            ('name', row['name']),
+            ('image', self.fields['image'].represent(
+                row['image'], row['image_renditions']
+            )),
+            ('images', self.fields['images'].represent(
+                row['image'], row['image_renditions']
+            )),
+            ('cooking_time', row['cooking_time']),
+        ))
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    recipes = RecipeCutSerializer(many=True)
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
+    recipes = RecipeCutSerializer(many=True, source='recipe_rows')
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -94,6 +214,8 @@ class SubscribeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return obj.following.filter(user=request.user).exists()
 
 
@@ -118,10 +240,16 @@ class IngredientRecipeWriteSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-    author = UserSerializer()
+class AuthorFragmentSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Часть рецепта, одинаковая для всех пользователей."""
+    author = AuthorFragmentSerializer()
     tags = TagSerializer(many=True)
     ingredients = IngredientRecipeReadSerializer(
         many=True,
@@ -131,20 +259,112 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'id', 'tags', 'author', 'ingredients', 'name', 'text',
+            'cooking_time'
+        )
+
+
+RECIPE_FRAGMENT_PREFETCH = (
+    'author',
+    'tags',
+    models.Prefetch(
+        'consists_of',
+        queryset=IngredientRecipe.objects.select_related('ingredient')
+    ),
+)
+
+
+def get_recipe_fragment_key(recipe):
+    return RECIPE_FRAGMENT_CACHE_KEY.format(
+        recipe_id=recipe.pk,
+        version=int(recipe.updated_at.timestamp() * 10**6)
+    )
+
+
+def attach_recipe_fragments(recipes):
+    """Записывает в recipe.fragment сериализованную общую часть.
+
+    Фрагменты читаются из кэша одним get_many. Автор, теги и
+    ингредиенты подгружаются только для промахов. Ключ содержит
+    updated_at, который обновляется при любом изменении этих данных.
+    """
+    timeout = settings.RECIPE_FRAGMENT_CACHE_TIMEOUT
+    keys = [get_recipe_fragment_key(recipe) for recipe in recipes]
+    cached = cache.get_many(keys) if timeout else {}
+    missed = [
+        recipe for recipe, key in zip(recipes, keys) if key not in cached
+    ]
+    models.prefetch_related_objects(missed, *RECIPE_FRAGMENT_PREFETCH)
+    fresh = {}
+    for recipe, key in zip(recipes, keys):
+        if key not in cached and key not in fresh:
+            fresh[key] = RecipeFragmentSerializer(recipe).data
+        recipe.fragment = cached.get(key) or fresh[key]
+    if timeout and fresh:
+        cache.set_many(fresh, timeout)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data
         )
+        attach_recipe_fragments(recipes)
+        return super().to_representation(recipes)
+
+
+class RecipeReadSerializer(serializers.ModelSerializer):
+    """Рецепт: кэшированный фрагмент и флаги текущего пользователя."""
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    image = RecipeImageField(rendition='large')
+    images = RecipeImagesField()
+
+    class Meta:
+        model = Recipe
+        fields = ('is_favorited', 'is_in_shopping_cart', 'image', 'images')
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, recipe):
+        if not hasattr(recipe, 'fragment'):
+            attach_recipe_fragments([recipe])
+        values = {
+            **recipe.fragment,
+            **super().to_representation(recipe),
+            'author': {
+                **recipe.fragment['author'],
+                'is_subscribed': self.get_is_subscribed(recipe),
+            },
+        }
+        return OrderedDict(
+            (field, values[field]) for field in RECIPE_READ_FIELDS
+        )
+
+    def get_is_subscribed(self, obj):
+        request = self.context.get('request')
+        if request.user.is_anonymous:
+            return False
+        if hasattr(obj, 'is_author_subscribed'):
+            return obj.is_author_subscribed
+        return Subscribe.objects.filter(
+            user=request.user, author_id=obj.author_id
+        ).exists()
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return request.user.favorite.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return request.user.cart.filter(recipe=obj).exists()
 
 
@@ -189,39 +409,117 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 INGREDIENT_REPETITION_ERROR
             )
+        found = Ingredient.objects.in_bulk(ingredients_set)
+        missing = ingredients_set - set(found)
+        if missing:
+            raise serializers.ValidationError(
+                INGREDIENT_DOES_NOT_EXIST_ERROR.format(
+                    ', '.join(map(str, sorted(missing)))
+                )
+            )
+        for ingredient in data['ingredients']:
+            ingredient['ingredient'] = found[ingredient['id']]
         return data
 
-    def add_ingredients(self, recipe, ingredients):
-        ingredients_list = [
-            IngredientRecipe(
-                ingredient=get_object_or_404(Ingredient, id=ingredient['id']),
-                recipe=recipe,
-                amount=ingredient['amount']
-            ) for ingredient in ingredients
-        ]
-        IngredientRecipe.objects.bulk_create(ingredients_list)
+    def set_ingredients(self, recipe, ingredients, existing=()):
+        """Приводит ингредиенты рецепта к переданным через разницу.
+
+        Неизменённые строки не трогаются, у изменённых обновляется
+        количество, лишние удаляются. Возвращает True, если нужно
+        сбросить списки покупок: удаление строк делает это через сигналы.
+        """
+        existing = {row.ingredient_id: row for row in existing}
+        rows, to_create, to_update = [], [], []
+        for ingredient in ingredients:
+            row = existing.pop(ingredient['id'], None)
+            if row is None:
+                row = IngredientRecipe(
+                    recipe=recipe,
+                    ingredient=ingredient['ingredient'],
+                    amount=ingredient['amount']
+                )
+                to_create.append(row)
+            elif row.amount != ingredient['amount']:
+                row.amount = ingredient['amount']
+                to_update.append(row)
+            row.ingredient = ingredient['ingredient']
+            rows.append(row)
+        IngredientRecipe.objects.bulk_create(to_create)
+        IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+        if existing:
+            IngredientRecipe.objects.filter(
+                id__in=[row.id for row in existing.values()]
+            ).delete()
+        self.prefetched['consists_of'] = rows
+        return bool(to_create or to_update) and not existing
+
+    def set_tags(self, recipe, tags):
+        recipe.tags.set(tags)
+        self.prefetched['tags'] = sorted(tags, key=lambda tag: tag.id)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
-        self.add_ingredients(recipe, ingredients)
-        recipe.tags.set(tags)
+        self.prefetched = {}
+        self.set_ingredients(recipe, ingredients)
+        self.set_tags(recipe, tags)
+        recipe.is_favorited = False
+        recipe.is_in_shopping_cart = False
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        self.add_ingredients(instance, validated_data.pop('ingredients'))
-
-        instance.tags.clear()
-        instance.tags.set(validated_data.pop('tags'))
-
-        return super().update(
-            instance, validated_data)
+        self.prefetched = {}
+        if self.set_ingredients(
+            instance,
+            validated_data.pop('ingredients'),
+            instance.consists_of.all()
+        ):
+            transaction.on_commit(
+                lambda: invalidate_recipe_shopping_carts(instance.id)
+            )
+        self.set_tags(instance, validated_data.pop('tags'))
+        return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        # Связи, записанные в create/update, отдаются без повторных
+        # запросов: UpdateModelMixin сбрасывает кэш prefetch у объекта.
+        if hasattr(self, 'prefetched'):
+            instance._prefetched_objects_cache = dict(self.prefetched)
+        request = self.context.get('request')
+        if request and instance.author_id == request.user.id:
+            instance.author = request.user
+            instance.is_author_subscribed = False
         return RecipeReadSerializer(
             instance,
             context={
                 'request': self.context.get('request')
             }).data
+
+
+class RelationBatchSerializer(serializers.Serializer):
+    """Списки id для пакетного добавления и удаления связей."""
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.RELATION_BATCH_MAX_SIZE,
+        required=False,
+        default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.RELATION_BATCH_MAX_SIZE,
+        required=False,
+        default=list
+    )
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError(BATCH_EMPTY_ERROR)
+        conflict = set(data['add']) & set(data['remove'])
+        if conflict:
+            raise serializers.ValidationError(BATCH_CONFLICT_ERROR.format(
+                ', '.join(map(str, sorted(conflict)))
+            ))
+        return data
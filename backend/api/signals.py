@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+from .db import install_execute_wrappers, schedule_health_checks
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+    transaction.on_commit(lambda: invalidate_token(instance.key))
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_user_tokens(instance.pk)
+    transaction.on_commit(lambda: invalidate_user_tokens(instance.pk))
+
+
+@receiver(request_started)
+def request_started_schedule_health_checks(sender, **kwargs):
+    schedule_health_checks()
+
+
+@receiver(connection_created)
+def connection_created_install_wrappers(sender, connection, **kwargs):
+    install_execute_wrappers(connection)
@@ -0,0 +1,155 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+# Запросы страницы рецептов при пустом кэше фрагментов: COUNT
+# пагинатора, рецепты с флагами пользователя, авторы, теги и
+# ингредиенты. С прогретым кэшем остаются только первые два. SET и
+# RESET statement_timeout на PostgreSQL отключены, чтобы число не
+# зависело от СУБД.
+RECIPE_LIST_QUERIES = 5
+RECIPE_LIST_CACHED_QUERIES = 2
+
+
+@override_settings(
+    RECIPE_RESPONSE_CACHE_TIMEOUT=0,
+    DB_STATEMENT_TIMEOUT=None,
+    DB_STATEMENT_TIMEOUTS={}
+)
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Читателев'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color='#E26C2D', slug=f'tag-{number}'
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def create_recipes(self, count):
+        for number in range(count):
+            author = User.objects.create(
+                email=f'author-{number}@example.com',
+                username=f'author-{number}',
+                first_name='Автор', last_name=str(number)
+            )
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                image='recipes/recipe.jpg', cooking_time=10
+            )
+            recipe.tags.set(self.tags)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+                for ingredient in self.ingredients
+            )
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+            Subscribe.objects.create(user=self.user, author=author)
+
+    def get_client(self, authenticated):
+        client = APIClient()
+        if authenticated:
+            client.force_authenticate(self.user)
+        return client
+
+    def assert_list_queries(self, count, authenticated):
+        self.create_recipes(count)
+        client = self.get_client(authenticated)
+        with self.assertNumQueries(RECIPE_LIST_QUERIES):
+            response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), count)
+        for recipe in response.data['results']:
+            self.assertEqual(recipe['is_favorited'], authenticated)
+            self.assertEqual(recipe['is_in_shopping_cart'], authenticated)
+            self.assertEqual(
+                recipe['author']['is_subscribed'], authenticated
+            )
+            self.assertEqual(len(recipe['tags']), len(self.tags))
+            self.assertEqual(
+                len(recipe['ingredients']), len(self.ingredients)
+            )
+        with self.assertNumQueries(RECIPE_LIST_CACHED_QUERIES):
+            self.assertEqual(
+                client.get('/api/recipes/').data, response.data
+            )
+
+    def test_anonymous_single_recipe(self):
+        self.assert_list_queries(1, authenticated=False)
+
+    def test_anonymous_full_page(self):
+        self.assert_list_queries(9, authenticated=False)
+
+    def test_authenticated_single_recipe(self):
+        self.assert_list_queries(1, authenticated=True)
+
+    def test_authenticated_full_page(self):
+        self.assert_list_queries(9, authenticated=True)
+
+
+class CounterFieldsSaveTest(TestCase):
+    """Полный save() устаревшего объекта не затирает счётчики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Авторов'
+        )
+        cls.reader = User.objects.create(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Читателев'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            image='recipes/recipe.jpg', cooking_time=10
+        )
+
+    def test_stale_user_save(self):
+        author = User.objects.get(pk=self.author.pk)
+        Subscribe.objects.create(user=self.reader, author=self.author)
+        author.set_password('new-password')
+        author.save()
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.recipes_count, 1)
+        self.assertTrue(author.check_password('new-password'))
+
+    def test_stale_recipe_save(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipe)
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.in_carts_count, 1)
+
+    def test_explicit_counter_save(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.favorites_count = 7
+        recipe.save(update_fields=['favorites_count'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 7)
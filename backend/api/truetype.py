@@ -0,0 +1,119 @@
+import struct
+import zlib
+from pathlib import Path
+
+
+class TrueTypeFont:
+    """Метрики TrueType-шрифта, нужные для встраивания в PDF.
+
+    Читаются только таблицы head, hhea, hmtx, cmap, OS/2 и post: этого
+    хватает на FontDescriptor и ширины глифов простого шрифта. Файл
+    встраивается целиком и сжимается один раз при загрузке.
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        self.data = path.read_bytes()
+        self.name = ''.join(
+            char for char in path.stem if char.isalnum() or char in '-_'
+        )
+        self.compressed = zlib.compress(self.data)
+        self.tables = self.read_tables()
+        head = self.table('head')
+        self.units_per_em = self.unpack('>H', head, 18)
+        self.bbox = [
+            self.scale(value)
+            for value in struct.unpack_from('>4h', head, 36)
+        ]
+        hhea = self.table('hhea')
+        ascent, descent = struct.unpack_from('>2h', hhea, 4)
+        self.ascent = self.scale(ascent)
+        self.descent = self.scale(descent)
+        self.advances = self.read_advances(self.unpack('>H', hhea, 34))
+        if 'OS/2' in self.tables and self.unpack(
+            '>H', self.table('OS/2'), 0
+        ) >= 2:
+            self.cap_height = self.scale(
+                self.unpack('>h', self.table('OS/2'), 88)
+            )
+        else:
+            self.cap_height = self.ascent
+        self.italic_angle = self.unpack('>i', self.table('post'), 4) / 65536
+        self.glyphs = self.read_unicode_cmap()
+
+    def read_tables(self):
+        count = self.unpack('>H', self.data, 4)
+        tables = {}
+        for index in range(count):
+            tag, _, offset, length = struct.unpack_from(
+                '>4sIII', self.data, 12 + 16 * index
+            )
+            tables[tag.decode('latin-1')] = (offset, length)
+        return tables
+
+    def table(self, tag):
+        offset, length = self.tables[tag]
+        return memoryview(self.data)[offset:offset + length]
+
+    @staticmethod
+    def unpack(fmt, data, offset):
+        return struct.unpack_from(fmt, data, offset)[0]
+
+    def scale(self, value):
+        return round(value * 1000 / self.units_per_em)
+
+    def read_advances(self, count):
+        return [
+            advance
+            for advance, _ in struct.iter_unpack(
+                '>Hh', self.table('hmtx')[:4 * count]
+            )
+        ]
+
+    def read_unicode_cmap(self):
+        """Таблица символ -> глиф из подтаблицы Windows Unicode BMP."""
+        cmap = self.table('cmap')
+        for index in range(self.unpack('>H', cmap, 2)):
+            platform, encoding, offset = struct.unpack_from(
+                '>HHI', cmap, 4 + 8 * index
+            )
+            if (platform, encoding) == (3, 1):
+                if self.unpack('>H', cmap, offset) == 4:
+                    return self.read_cmap_format_4(cmap[offset:])
+        raise ValueError('В шрифте нет таблицы cmap формата 4 для Unicode.')
+
+    def read_cmap_format_4(self, subtable):
+        segments = self.unpack('>H', subtable, 6) // 2
+        arrays = [
+            struct.unpack_from(
+                '>%dH' % segments, subtable, 14 + 2 * segments * number
+                + (2 if number else 0)
+            )
+            for number in range(4)
+        ]
+        range_offsets_start = 16 + 6 * segments
+        glyphs = {}
+        for segment, (end, start, delta, range_offset) in enumerate(
+            zip(*arrays)
+        ):
+            for code in range(start, min(end, 0xFFFE) + 1):
+                if range_offset:
+                    glyph = self.unpack(
+                        '>H', subtable,
+                        range_offsets_start + 2 * segment + range_offset
+                        + 2 * (code - start)
+                    )
+                    if glyph:
+                        glyph = (glyph + delta) % 65536
+                else:
+                    glyph = (code + delta) % 65536
+                if glyph:
+                    glyphs[code] = glyph
+        return glyphs
+
+    def width(self, char):
+        """Ширина символа в тысячных долях кегля, 0 без глифа."""
+        glyph = self.glyphs.get(ord(char)) if char else None
+        if glyph is None:
+            return 0
+        return self.scale(self.advances[min(glyph, len(self.advances) - 1)])
@@ -2,8 +2,10 @@ from django.urls import include, path
 from djoser.views import TokenCreateView, TokenDestroyView
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet, SubscribeViewSet,
-                    TagViewSet, UserViewSet)
+from .async_views import (ingredient_list, recipe_detail, recipe_list,
+                          subscription_list, tag_list)
+from .views import (IngredientViewSet, MetricsView, RecipeViewSet,
+                    SubscribeViewSet, TagViewSet, UserViewSet)
 
 api_router = DefaultRouter()
 api_router.register('users', UserViewSet, basename='users')
@@ -17,11 +19,31 @@ urlpatterns = [
         SubscribeViewSet.as_view({'get': 'list'}),
         name='subscriptions'
     ),
+    path(
+        'users/subscriptions/batch/',
+        SubscribeViewSet.as_view({'post': 'batch'}),
+        name='subscriptions-batch'
+    ),
     path(
         'users/<int:user_id>/subscribe/',
         SubscribeViewSet.as_view({'post': 'create', 'delete': 'destroy'}),
         name='subscribe'
     ),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('async/recipes/', recipe_list, name='async-recipes-list'),
+    path(
+        'async/recipes/<int:pk>/', recipe_detail,
+        name='async-recipes-detail'
+    ),
+    path('async/tags/', tag_list, name='async-tags-list'),
+    path(
+        'async/ingredients/', ingredient_list,
+        name='async-ingredients-list'
+    ),
+    path(
+        'async/users/subscriptions/', subscription_list,
+        name='async-subscriptions'
+    ),
     path('', include(api_router.urls)),
     path(
         'auth/token/login/', TokenCreateView.as_view(),
@@ -1,27 +1,88 @@
-from django.db.models.aggregates import Sum
-from django.http import HttpResponse
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import BooleanField, OuterRef, Subquery, Value
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from djoser.serializers import SetPasswordSerializer
 from rest_framework import status, validators, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes.ingredient_index import get_ingredient_index
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.relations import (add_relation, add_relations, clear_relations,
+                               remove_relation, remove_relations)
+from recipes.shopping_cart import get_shopping_cart
+from recipes.versions import INGREDIENTS_TABLE, TAGS_TABLE
 from users.models import Subscribe, User
+from .conditional import conditional_recipe, conditional_table
 from .filters import IngredientFilter, RecipeFilter
+from .middleware import get_request_metrics
+from .pagination import KeysetPagination
 from .permissions import IsAuthorOrReadOnly, IsReadOnly, UserPermission
+from .renderers import (ShoppingCartCSVRenderer, ShoppingCartPDFRenderer,
+                        ShoppingCartTextRenderer)
+from .response_cache import cache_anonymous_response, get_response_cache_stats
 from .serializers import (IngredientSerializer, RecipeCutSerializer,
                           RecipeReadSerializer, RecipeWriteSerializer,
-                          SubscribeSerializer, TagSerializer, UserSerializer)
+                          RelationBatchSerializer, SubscribeSerializer,
+                          TagSerializer, UserSerializer)
 
 SUBSCRIBE_TO_YOURSELF_ERROR = 'Нельзя подписатья на самого себя!'
 UNSUBSCRIBE_TO_YOURSELF_ERROR = 'Вы пытаетесь отписаться от самого себя!'
 EXIST_SUBSCRIBE_ERROR = 'Вы уже подписаны на этого пользователя!'
 NON_EXIST_UNSUBSCRIBE_ERROR = 'Вы и так не подписаны на этого пользователя!'
-CART_INGREDIENTS_FORMAT = '\t{name}, {measurement_unit}: {total}'
-SHOPPING_CART_FILENAME = 'shopping_cart.txt'
+EXIST_RECIPE_RELATION_ERROR = 'Рецепт уже добавлен!'
+NON_EXIST_RECIPE_RELATION_ERROR = 'Рецепт и так не добавлен!'
+FORBIDDEN_STATUS = 'forbidden'
+RECIPE_CUT_FIELDS = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-pub_date', '-id'),
+}
+
+
+def run_relation_batch(request, model, target_field, forbidden=()):
+    """Добавляет и удаляет связи пользователя пачкой в одной транзакции."""
+    serializer = RelationBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    user_id = request.user.id
+    results = []
+    with transaction.atomic():
+        for action_name, handler in (
+            ('add', add_relations), ('remove', remove_relations)
+        ):
+            target_ids = serializer.validated_data[action_name]
+            allowed = [
+                target_id for target_id in target_ids
+                if target_id not in forbidden
+            ]
+            statuses = (
+                handler(model, user_id, target_field, allowed)
+                if allowed else {}
+            )
+            results.extend(
+                {
+                    'id': target_id,
+                    'action': action_name,
+                    'status': statuses.get(target_id, FORBIDDEN_STATUS),
+                }
+                for target_id in target_ids
+            )
+    return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+def get_recipe_id(pk):
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        raise Http404
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -30,10 +91,9 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = (UserPermission,)
 
     def perform_create(self, serializer):
-        password = serializer.validated_data['password']
-        user = serializer.save()
-        user.set_password(password)
-        user.save()
+        serializer.save(
+            password=make_password(serializer.validated_data['password'])
+        )
 
     @action(detail=False, methods=['get'])
     def me(self, request):
@@ -50,10 +110,12 @@ class UserViewSet(viewsets.ModelViewSet):
         self.request.user.set_password(
             serializer.validated_data['new_password']
         )
-        self.request.user.save()
+        self.request.user.save(update_fields=['password'])
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@method_decorator(conditional_table(TAGS_TABLE), name='list')
+@method_decorator(conditional_table(TAGS_TABLE), name='retrieve')
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -61,6 +123,8 @@ class TagViewSet(viewsets.ModelViewSet):
     permission_classes = (IsReadOnly,)
 
 
+@method_decorator(conditional_table(INGREDIENTS_TABLE), name='list')
+@method_decorator(conditional_table(INGREDIENTS_TABLE), name='retrieve')
 class IngredientViewSet(viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -68,81 +132,165 @@ class IngredientViewSet(viewsets.ModelViewSet):
     permission_classes = (IsReadOnly,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name or not settings.INGREDIENT_AUTOCOMPLETE_INDEX:
+            return super().list(request, *args, **kwargs)
+        ingredients = get_ingredient_index().search(
+            name, settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 class SubscribeViewSet(viewsets.ModelViewSet):
     serializer_class = SubscribeSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_author(self, user_id):
-        return get_object_or_404(User, id=user_id)
+        return get_object_or_404(User.objects.only('id'), id=user_id)
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None or not recipes_limit.isdigit():
+            return None
+        return int(recipes_limit) or None
+
+    def get_authors(self):
+        return User.objects.annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('id')
+
+    def attach_recipes(self, authors):
+        """Загружает рецепты авторов одним запросом через values().
+
+        RecipeCutSerializer строит ответ прямо из строк, без объектов
+        Recipe.
+        """
+        recipes = Recipe.objects.filter(author__in=authors).order_by(
+            '-pub_date', '-id'
+        )
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('id')[:recipes_limit]
+            ))
+        rows = defaultdict(list)
+        for row in recipes.values(
+            'author_id', *RecipeCutSerializer.values_fields
+        ):
+            rows[row['author_id']].append(row)
+        for author in authors:
+            author.recipe_rows = rows[author.id]
+        return authors
 
     def list(self, request):
-        queryset = User.objects.filter(following__user=self.request.user)
+        queryset = self.get_authors().filter(following__user=request.user)
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
+            serializer = self.get_serializer(
+                self.attach_recipes(page), many=True
+            )
             return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = self.get_serializer(
+            self.attach_recipes(list(queryset)), many=True
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def create(self, request, user_id=None):
-        author = self.get_author(user_id)
-        if request.user == author:
+        if request.user.id == user_id:
             raise validators.ValidationError(SUBSCRIBE_TO_YOURSELF_ERROR)
-
-        if Subscribe.objects.filter(user=request.user, author=author).exists():
+        if not add_relation(Subscribe, request.user.id, 'author', user_id):
+            self.get_author(user_id)
             raise validators.ValidationError(EXIST_SUBSCRIBE_ERROR)
-
-        Subscribe.objects.create(
-            user=request.user,
-            author=author
-        )
         serializer = SubscribeSerializer(
-            author, context={'request': request}
+            self.attach_recipes([self.get_authors().get(id=user_id)])[0],
+            context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def batch(self, request):
+        return run_relation_batch(
+            request, Subscribe, 'author', forbidden={request.user.id}
+        )
+
     def destroy(self, request, user_id=None):
-        author = self.get_author(user_id)
-        if request.user == author:
+        if request.user.id == user_id:
             raise validators.ValidationError(UNSUBSCRIBE_TO_YOURSELF_ERROR)
-        if not Subscribe.objects.filter(
-            user=request.user, author=author
-        ).exists():
+        if not remove_relation(Subscribe, request.user.id, 'author', user_id):
+            self.get_author(user_id)
             raise validators.ValidationError(NON_EXIST_UNSUBSCRIBE_ERROR)
-        Subscribe.objects.filter(
-            user=request.user,
-            author=author
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@method_decorator(cache_anonymous_response, name='list')
+@method_decorator(
+    [conditional_recipe, cache_anonymous_response], name='retrieve'
+)
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     filterset_class = RecipeFilter
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            # Поиск сортирует по релевантности, а курсор — по своему
+            # ключу, поэтому с search всегда постраничный вывод.
+            cursor_mode = (
+                KeysetPagination.cursor_query_param
+                in self.request.query_params
+                and 'search' not in self.request.query_params
+            )
+            if cursor_mode:
+                self._paginator = KeysetPagination()
+                self._paginator.ordering = self.get_ordering()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_ordering(self):
+        return RECIPE_ORDERINGS.get(
+            self.request.query_params.get('ordering'), Recipe._meta.ordering
+        )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        user = self.request.user
+        return queryset.with_user_flags(user).order_by(*self.get_ordering())
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['image_rendition'] = 'card'
+        return context
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def get_intersection_model(self, request, pk, model):
-        recipe = get_object_or_404(Recipe, id=pk)
-        serializer = RecipeCutSerializer(recipe, context={'request': request})
+        recipe_id = get_recipe_id(pk)
         if request.method == 'POST':
-            model.objects.create(
-                user=request.user,
-                recipe=recipe
+            if not add_relation(model, request.user.id, 'recipe', recipe_id):
+                get_object_or_404(Recipe.objects.only('id'), id=recipe_id)
+                raise validators.ValidationError(EXIST_RECIPE_RELATION_ERROR)
+            serializer = RecipeCutSerializer(
+                Recipe.objects.only(*RECIPE_CUT_FIELDS).get(id=recipe_id),
+                context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        model.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).delete()
+        if not remove_relation(model, request.user.id, 'recipe', recipe_id):
+            get_object_or_404(Recipe.objects.only('id'), id=recipe_id)
+            raise validators.ValidationError(NON_EXIST_RECIPE_RELATION_ERROR)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -160,31 +308,59 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.get_intersection_model(request, pk, ShoppingCart)
 
     @action(
-        detail=False, methods=['get'],
+        detail=False, methods=['post'], url_path='favorite/batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return run_relation_batch(request, Favorite, 'recipe')
+
+    @action(
+        detail=False, methods=['post'], url_path='shopping_cart/batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        return run_relation_batch(request, ShoppingCart, 'recipe')
+
+    @action(
+        detail=False, methods=['delete'], url_path='shopping_cart',
         permission_classes=(IsAuthenticated,)
     )
+    def clear_shopping_cart(self, request):
+        removed = clear_relations(ShoppingCart, request.user.id, 'recipe')
+        return Response({'removed': removed}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False, methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingCartTextRenderer,
+            ShoppingCartCSVRenderer,
+            ShoppingCartPDFRenderer
+        )
+    )
     def download_shopping_cart(self, request):
-        text_lines = ['Список покупок\n']
-        for item in IngredientRecipe.objects.filter(
-            recipe__cart__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        ):
-            text_lines.append(
-                CART_INGREDIENTS_FORMAT.format(
-                    name=item['ingredient__name'],
-                    measurement_unit=item['ingredient__measurement_unit'],
-                    total=item['total_amount']
-                )
-            )
-        response_content = '\n'.join(text_lines)
-        response = HttpResponse(
-            response_content, content_type='text/plain; charset=utf8'
+        rows = get_shopping_cart(request.user.id)
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += '; charset={0}'.format(renderer.charset)
+        response = StreamingHttpResponse(
+            renderer.stream(rows), content_type=content_type
         )
         response['Content-Disposition'] = 'attachment; filename={0}'.format(
-            SHOPPING_CART_FILENAME
-            )
+            renderer.get_filename()
+        )
         return response
+
+
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(
+            {
+                'response_cache': get_response_cache_stats(),
+                'requests': get_request_metrics(),
+            },
+            status=status.HTTP_200_OK
+        )
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -31,6 +32,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
+    'api.middleware.StatementTimeoutMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,19 +64,160 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.postgresql')
+# PgBouncer в режиме pool_mode = transaction: без серверных курсоров
+# и без SET на сессию, см. README.
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'False') == 'True'
+# Таймауты SQL в HTTP-запросах, мс; 0 — без ограничения. Общий таймаут
+# задаётся соединению при подключении, эндпоинты из DB_STATEMENT_TIMEOUTS
+# меняют его через SET на время запроса.
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 5000))
+# Переопределения по имени URL: "recipes-list=2000,recipes-detail=1000".
+DB_STATEMENT_TIMEOUTS = {
+    name.strip(): int(timeout)
+    for name, timeout in (
+        item.split('=')
+        for item in os.getenv('DB_STATEMENT_TIMEOUTS', '').split(',')
+        if item.strip()
+    )
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
+        'ENGINE': DB_ENGINE,
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+        ),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {},
+    }
+}
+if DB_ENGINE == 'django.db.backends.postgresql':
+    DATABASES['default']['OPTIONS']['connect_timeout'] = int(
+        os.getenv('DB_CONNECT_TIMEOUT', 5)
+    )
+    # Команды manage.py и миграции подключаются без таймаута. PgBouncer
+    # не принимает параметр options при подключении.
+    management_command = (
+        Path(sys.argv[0]).name == 'manage.py'
+        and sys.argv[1:2] != ['runserver']
+    )
+    if DB_STATEMENT_TIMEOUT and not DB_PGBOUNCER and not management_command:
+        DATABASES['default']['OPTIONS']['options'] = (
+            '-c statement_timeout={0}'.format(DB_STATEMENT_TIMEOUT)
+        )
+# Реплики только для чтения через запятую: "host:port" для PostgreSQL,
+# путь к файлу для SQLite.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    item.strip() for item in os.getenv('DB_REPLICAS', '').split(',')
+    if item.strip()
+):
+    if DB_ENGINE == 'django.db.backends.sqlite3':
+        location = {'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        location = {
+            'HOST': host, 'PORT': port or DATABASES['default']['PORT']
+        }
+    alias = 'replica_{0}'.format(number)
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        **location,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+# Сколько секунд клиент читает из основной базы после своей записи.
+DB_REPLICA_PIN_TIMEOUT = int(os.getenv('DB_REPLICA_PIN_TIMEOUT', 10))
+DATABASE_ROUTERS = ['api.db.PrimaryReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# TrueType-шрифт с кириллицей, который встраивается в PDF со списком
+# покупок; без него PDF набирается Helvetica без русских букв.
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_RESPONSE_CACHE_TIMEOUT', 60 * 5)
+)
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 60))
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = int(
+    os.getenv('INGREDIENT_AUTOCOMPLETE_LIMIT', 50)
+)
+INGREDIENT_AUTOCOMPLETE_INDEX = (
+    os.getenv('INGREDIENT_AUTOCOMPLETE_INDEX', 'False') == 'True'
+)
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 60 * 5))
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 60))
+
+RELATION_BATCH_MAX_SIZE = int(os.getenv('RELATION_BATCH_MAX_SIZE', 100))
+
+IMAGE_PIPELINE_BACKEND = os.getenv('IMAGE_PIPELINE_BACKEND', 'thread')
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', 0)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.request_metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_USER_MODEL = 'users.User'
 
+PASSWORD_HASHER_CLASSES = {
+    'argon2': 'users.hashers.ConfigurableArgon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+# Первый хэшер используется для новых паролей, остальные только для
+# проверки старых хэшей, которые пересчитываются при входе.
+PASSWORD_HASHERS = list(dict.fromkeys([
+    PASSWORD_HASHER_CLASSES[os.getenv('PASSWORD_HASHER', 'argon2')],
+    *PASSWORD_HASHER_CLASSES.values(),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]))
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', 1))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -90,7 +235,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -99,6 +244,10 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.FoodPagination',
     'PAGE_SIZE': 9,
 }
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Favorite, Ingredient, IngredientRecipe, Recipe, Tag
+from .models import Ingredient, IngredientRecipe, Recipe, Tag
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -32,13 +32,11 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'text',
         'cooking_time',
-        'favorites'
+        'favorites_count',
+        'in_carts_count'
     )
     list_filter = ('name',)
 
-    def favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
-
 
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
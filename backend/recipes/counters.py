@@ -0,0 +1,44 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Subscribe, User
+from .models import Favorite, Recipe, ShoppingCart
+
+# Модель со счётчиком, поле счётчика, считаемая модель и её внешний ключ.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribe, 'author'),
+)
+
+
+def change_counters(model, pks, field, delta):
+    """Атомарно меняет счётчики через F(), не опуская их ниже нуля."""
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(counted_model, foreign_key):
+    return Coalesce(Subquery(
+        counted_model.objects.filter(
+            **{foreign_key: OuterRef('pk')}
+        ).order_by().values(foreign_key).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def reconcile_counters(fix=True):
+    """Сверяет счётчики с данными и возвращает число расхождений."""
+    drift = {}
+    for model, field, counted_model, foreign_key in COUNTERS:
+        expression = actual_count(counted_model, foreign_key)
+        drift[f'{model._meta.model_name}.{field}'] = model.objects.annotate(
+            actual=expression
+        ).exclude(**{field: F('actual')}).count()
+        if fix:
+            model.objects.update(**{field: expression})
+    return drift
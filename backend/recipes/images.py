@@ -0,0 +1,147 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from PIL import Image
+
+from .models import Recipe
+from .versions import bump_content_generation
+
+logger = logging.getLogger(__name__)
+
+RENDITION_SIZES = {
+    'thumbnail': (320, 320),
+    'card': (640, 640),
+    'large': (1280, 1280),
+}
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Pillow 9.1+ переносит константы фильтров в Image.Resampling.
+RESAMPLING = getattr(Image, 'Resampling', Image)
+RENDITION_PATH = 'recipes/renditions/{stem}_{rendition}.{extension}'
+
+
+def render_renditions(name):
+    """Сохраняет уменьшенные копии изображения и возвращает их пути."""
+    with default_storage.open(name) as file:
+        original = Image.open(file)
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', original.size, 'white')
+        original = original.convert('RGBA')
+        background.paste(original, mask=original.getchannel('A'))
+        original = background
+    stem = os.path.splitext(os.path.basename(name))[0]
+    renditions = {'source': name}
+    for rendition, size in RENDITION_SIZES.items():
+        image = original.copy()
+        image.thumbnail(size, RESAMPLING.LANCZOS)
+        renditions[rendition] = {}
+        for extension, (image_format, options) in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, **options)
+            path = RENDITION_PATH.format(
+                stem=stem, rendition=rendition, extension=extension
+            )
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            renditions[rendition][extension] = default_storage.save(
+                path, ContentFile(buffer.getvalue())
+            )
+    return renditions
+
+
+def get_rendition_paths(renditions):
+    return [
+        path
+        for rendition in RENDITION_SIZES
+        for path in renditions.get(rendition, {}).values()
+    ]
+
+
+def generate_renditions(recipe_id):
+    """Строит копии изображения рецепта и сохраняет их пути в рецепте.
+
+    Запись идёт через update() с проверкой имени исходного файла: если
+    пока шла обработка картинку заменили, результат отбрасывается.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_renditions'
+    ).first()
+    if recipe is None or not recipe.image:
+        return
+    previous = recipe.image_renditions
+    renditions = render_renditions(recipe.image.name)
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_renditions=renditions, updated_at=timezone.now())
+    kept, discarded = (
+        (renditions, previous) if updated else (previous, renditions)
+    )
+    for path in set(get_rendition_paths(discarded)) - set(
+        get_rendition_paths(kept)
+    ):
+        default_storage.delete(path)
+    if updated:
+        bump_content_generation()
+
+
+class SyncImagePipeline:
+    """Обрабатывает изображения сразу, в потоке запроса."""
+
+    def submit(self, recipe_id):
+        generate_renditions(recipe_id)
+
+
+class ThreadImagePipeline:
+    """Обрабатывает изображения в пуле потоков процесса."""
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='image-pipeline'
+        )
+
+    @staticmethod
+    def run(recipe_id):
+        try:
+            generate_renditions(recipe_id)
+        except Exception:
+            logger.exception(
+                'Не удалось обработать изображение рецепта %s', recipe_id
+            )
+        finally:
+            connections.close_all()
+
+    def submit(self, recipe_id):
+        self.executor.submit(self.run, recipe_id)
+
+
+IMAGE_PIPELINES = {
+    'sync': lambda: SyncImagePipeline(),
+    'thread': lambda: ThreadImagePipeline(settings.IMAGE_PIPELINE_WORKERS),
+}
+
+
+class ImagePipelineHolder:
+    def __init__(self):
+        self.pipeline = None
+
+    def get(self):
+        if self.pipeline is None:
+            self.pipeline = IMAGE_PIPELINES[settings.IMAGE_PIPELINE_BACKEND]()
+        return self.pipeline
+
+
+image_pipeline = ImagePipelineHolder()
+
+
+def schedule_renditions(recipe_id):
+    image_pipeline.get().submit(recipe_id)
@@ -0,0 +1,71 @@
+from bisect import bisect_left
+from time import monotonic
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """Неизменяемый отсортированный индекс ингредиентов для автодополнения.
+
+    Совпадения по префиксу ищутся бинарным поиском, затем добавляются
+    совпадения по подстроке, как и в IngredientFilter.
+    """
+
+    def __init__(self, ingredients):
+        entries = sorted(
+            ((ingredient['name'].lower(), ingredient)
+             for ingredient in ingredients),
+            key=lambda entry: (entry[0], entry[1]['id'])
+        )
+        self.keys = tuple(key for key, _ in entries)
+        self.ingredients = tuple(ingredient for _, ingredient in entries)
+
+    def search(self, query, limit):
+        query = query.lower()
+        results = []
+        start = bisect_left(self.keys, query)
+        for position in range(start, len(self.keys)):
+            if len(results) == limit:
+                return results
+            if not self.keys[position].startswith(query):
+                break
+            results.append(self.ingredients[position])
+        for key, ingredient in zip(self.keys, self.ingredients):
+            if len(results) == limit:
+                break
+            if query in key and not key.startswith(query):
+                results.append(ingredient)
+        return results
+
+
+class IngredientIndexCache:
+    """Хранит индекс процесса и перестраивает его по истечении TTL."""
+
+    def __init__(self):
+        self.index = None
+        self.built_at = 0.0
+
+    def get(self):
+        expired = monotonic() - self.built_at > settings.INGREDIENT_INDEX_TTL
+        if self.index is None or expired:
+            self.index = IngredientIndex(Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            ))
+            self.built_at = monotonic()
+        return self.index
+
+    def reset(self):
+        self.index = None
+
+
+ingredient_index_cache = IngredientIndexCache()
+
+
+def get_ingredient_index():
+    return ingredient_index_cache.get()
+
+
+def reset_ingredient_index():
+    ingredient_index_cache.reset()
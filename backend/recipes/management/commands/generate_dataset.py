@@ -0,0 +1,174 @@
+import io
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, call_command
+from django.db import transaction
+from PIL import Image
+
+from recipes.counters import reconcile_counters
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_vectors
+from recipes.versions import bump_content_generation
+from users.models import Subscribe, User
+
+DATASET_EMAIL = 'bench-user-{number}@example.com'
+DATASET_PASSWORD = 'bench-password'
+DATASET_IMAGE = 'recipes/bench.jpg'
+DATASET_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+RECIPE_WORDS = (
+    'Суп', 'Салат', 'Рагу', 'Пирог', 'Запеканка', 'Каша', 'Омлет',
+    'Паста', 'Плов', 'Котлеты', 'Блины', 'Гратен', 'Ризотто',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт детерминированный набор данных для нагрузочных замеров: '
+        'пользователей, рецепты, подписки, избранное и списки покупок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=30)
+        parser.add_argument('--cart', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def batched_create(self, model, objects):
+        for start in range(0, len(objects), self.batch_size):
+            model.objects.bulk_create(
+                objects[start:start + self.batch_size],
+                ignore_conflicts=True
+            )
+
+    def ensure_reference_data(self):
+        if not Ingredient.objects.exists():
+            call_command('load_data', stdout=self.stdout)
+        for name, color, slug in DATASET_TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        if not default_storage.exists(DATASET_IMAGE):
+            buffer = io.BytesIO()
+            Image.new('RGB', (1200, 800), '#e26c2d').save(buffer, 'JPEG')
+            default_storage.save(DATASET_IMAGE, ContentFile(buffer.getvalue()))
+
+    def create_users(self, count):
+        password = make_password(DATASET_PASSWORD)
+        self.batched_create(User, [
+            User(
+                email=DATASET_EMAIL.format(number=number),
+                username=f'bench-user-{number}',
+                first_name='Имя', last_name=f'Фамилия {number}',
+                password=password
+            )
+            for number in range(count)
+        ])
+        return list(User.objects.filter(
+            email__startswith='bench-user-'
+        ).values_list('id', flat=True).order_by('id'))
+
+    def create_recipes(self, count, user_ids):
+        start_id = (Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0)
+        authors = self.rng.choices(
+            user_ids,
+            weights=[1 / (rank + 1) for rank in range(len(user_ids))],
+            k=count
+        )
+        self.batched_create(Recipe, [
+            Recipe(
+                author_id=author_id,
+                name='{0} №{1}'.format(self.rng.choice(RECIPE_WORDS), number),
+                image=DATASET_IMAGE,
+                text='Пошаговое описание приготовления. ' * 5,
+                cooking_time=self.rng.randint(5, 180)
+            )
+            for number, author_id in enumerate(authors)
+        ])
+        return list(Recipe.objects.filter(
+            id__gt=start_id
+        ).values_list('id', flat=True).order_by('id'))
+
+    def create_recipe_relations(self, recipe_ids):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        # Закон Ципфа: небольшая часть ингредиентов встречается в
+        # большинстве рецептов, как соль, масло и лук в реальных данных.
+        self.rng.shuffle(ingredient_ids)
+        weights = [1 / (rank + 1) for rank in range(len(ingredient_ids))]
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        through = Recipe.tags.through
+        ingredients, tags = [], []
+        for recipe_id in recipe_ids:
+            chosen = set(self.rng.choices(
+                ingredient_ids, weights=weights, k=self.rng.randint(3, 12)
+            ))
+            ingredients.extend(
+                IngredientRecipe(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500)
+                )
+                for ingredient_id in chosen
+            )
+            tags.extend(
+                through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(1, min(3, len(tag_ids)))
+                )
+            )
+        self.batched_create(IngredientRecipe, ingredients)
+        self.batched_create(through, tags)
+
+    def create_user_relations(self, user_ids, recipe_ids, options):
+        subscriptions, favorites, carts = [], [], []
+        for user_id in user_ids:
+            subscriptions.extend(
+                Subscribe(user_id=user_id, author_id=author_id)
+                for author_id in self.rng.sample(
+                    user_ids, min(options['subscriptions'], len(user_ids))
+                )
+                if author_id != user_id
+            )
+            favorites.extend(
+                Favorite(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in self.rng.sample(
+                    recipe_ids, min(options['favorites'], len(recipe_ids))
+                )
+            )
+            carts.extend(
+                ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in self.rng.sample(
+                    recipe_ids, min(options['cart'], len(recipe_ids))
+                )
+            )
+        self.batched_create(Subscribe, subscriptions)
+        self.batched_create(Favorite, favorites)
+        self.batched_create(ShoppingCart, carts)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        with transaction.atomic():
+            self.ensure_reference_data()
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(options['recipes'], user_ids)
+            self.create_recipe_relations(recipe_ids)
+            self.create_user_relations(user_ids, recipe_ids, options)
+            update_search_vectors(Recipe.objects.filter(id__in=recipe_ids))
+            reconcile_counters()
+            transaction.on_commit(bump_content_generation)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, рецептов: {len(recipe_ids)}. '
+            f'Пароль пользователей: {DATASET_PASSWORD}'
+        ))
@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand
+
+from recipes.images import generate_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить копии и для рецептов, где они уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').order_by('id')
+        if not options['force']:
+            recipes = recipes.filter(image_renditions={})
+        processed = failed = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            try:
+                generate_renditions(recipe_id)
+            except OSError as error:
+                failed += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Рецепт {recipe_id}: {error}'
+                ))
+                continue
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,118 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from foodgram.settings import BASE_DIR
+from recipes.ingredient_index import reset_ingredient_index
+from recipes.models import Ingredient, Tag
+from recipes.versions import (INGREDIENTS_TABLE, TAGS_TABLE,
+                              bump_table_version)
+
+INGREDIENTS_DATA_FILE = os.path.join(BASE_DIR, 'data/ingredients.json')
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+TAG_FIELDS = ('name', 'color', 'slug')
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """Читает JSON-массив объектов по одному элементу, не загружая файл."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался JSON-массив.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON-массив.')
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_records(file, fields):
+    if file.name.endswith('.csv'):
+        for row in csv.reader(file):
+            if row:
+                yield dict(zip(fields, row))
+        return
+    for item in iter_json_array(file):
+        yield {field: item[field] for field in fields}
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты и теги из JSON или CSV. '
+        'Повторный запуск не создаёт дубликатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients', default=INGREDIENTS_DATA_FILE,
+            help='Файл ингредиентов (.json или .csv: name,measurement_unit).'
+        )
+        parser.add_argument(
+            '--tags',
+            help='Файл тегов (.json или .csv: name,color,slug).'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Выполнить загрузку и откатить транзакцию.'
+        )
+
+    def load(self, model, path, fields, batch_size):
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден.')
+        count_before = model.objects.count()
+        with open(path, 'r', encoding='utf-8') as file:
+            for batch in batches(iter_records(file, fields), batch_size):
+                model.objects.bulk_create(
+                    [model(**record) for record in batch],
+                    ignore_conflicts=True
+                )
+        return model.objects.count() - count_before
+
+    def handle(self, *args, **options):
+        sources = [(
+            Ingredient, options['ingredients'],
+            INGREDIENT_FIELDS, INGREDIENTS_TABLE
+        )]
+        if options['tags']:
+            sources.append((Tag, options['tags'], TAG_FIELDS, TAGS_TABLE))
+        with transaction.atomic():
+            for model, path, fields, table in sources:
+                created = self.load(
+                    model, path, fields, options['batch_size']
+                )
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: добавлено {created}'
+                )
+                if created:
+                    transaction.on_commit(
+                        lambda table=table: bump_table_version(table)
+                    )
+            if options['dry_run']:
+                transaction.set_rollback(True)
+                self.stdout.write('Пробный запуск: изменения отменены.')
+                return
+            transaction.on_commit(reset_ingredient_index)
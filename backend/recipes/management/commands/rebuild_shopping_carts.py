@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand
+
+from recipes.models import ShoppingCart, ShoppingCartSummary
+from recipes.shopping_cart import refresh_shopping_cart
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает сохранённые сводки списков покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Сравнить сохранённые сводки с актуальными данными.'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = ShoppingCart.objects.order_by().values_list(
+            'user_id', flat=True
+        ).union(ShoppingCartSummary.objects.order_by().values_list(
+            'user_id', flat=True
+        ))
+        rebuilt = stale = 0
+        for user_id in sorted(user_ids):
+            stored = ShoppingCartSummary.objects.filter(
+                user_id=user_id, rows__isnull=False
+            ).values_list('rows', flat=True).first()
+            rows = refresh_shopping_cart(user_id)
+            rebuilt += 1
+            if options['verify'] and stored is not None and stored != rows:
+                stale += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Устаревшая сводка пользователя {user_id}'
+                ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано сводок: {rebuilt}'
+        ))
+        if options['verify']:
+            self.stdout.write(f'Устаревших сводок: {stale}')
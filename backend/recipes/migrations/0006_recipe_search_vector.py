@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 18:51
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+CREATE_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)'
+)
+DROP_INDEX_SQL = 'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin'
+BACKFILL_SQL = '''
+    UPDATE recipes_recipe SET search_vector =
+        setweight(to_tsvector(%(config)s::regconfig, name), 'A')
+        || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS ingredient_recipe
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = ingredient_recipe.ingredient_id
+            WHERE ingredient_recipe.recipe_id = recipes_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%(config)s::regconfig, text), 'C')
+'''
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Та же конфигурация, что и при индексации и поиске в search.py.
+    schema_editor.execute(
+        BACKFILL_SQL, {'config': settings.RECIPE_SEARCH_CONFIG}
+    )
+    schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,7 +1,9 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 
-from users.models import User
+from users.models import CounterFieldsMixin, Subscribe, User
 
 
 class Tag(models.Model):
@@ -39,12 +41,59 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique ingredient'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name[:20]}, {self.measurement_unit[:20]}'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами избранного, списка покупок и
+        подписки на автора."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_author_subscribed=models.Value(
+                    False, output_field=models.BooleanField()
+                )
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_author_subscribed=models.Exists(
+                Subscribe.objects.filter(
+                    user=user, author=models.OuterRef('author_id')
+                )
+            )
+        )
+
+    def touch(self):
+        """Обновляет updated_at без сигналов: по нему версионируются
+        кэшированные представления рецептов."""
+        return self.update(updated_at=timezone.now())
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         to=User,
         on_delete=models.CASCADE,
@@ -59,6 +108,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение'
     )
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения'
+    )
     text = models.TextField(
         verbose_name='Текстовое описание'
     )
@@ -79,11 +134,43 @@ class Recipe(models.Model):
     pub_date = models.DateField(
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_feed_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popular_idx'
+            )
+        ]
 
 
 class IngredientRecipe(models.Model):
@@ -160,3 +247,51 @@ class ShoppingCart(models.Model):
                 name='unique cart'
             )
         ]
+
+
+class ShoppingCartSummary(models.Model):
+    """Сохранённая сводка ингредиентов списка покупок пользователя.
+
+    rows равно NULL, пока сводку не пересчитали после изменения списка;
+    version растёт при каждом сбросе, чтобы пересчёт по устаревшим
+    данным не перезаписал сброс.
+    """
+    user = models.OneToOneField(
+        to=User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shopping_cart_summary',
+        verbose_name='Пользователь'
+    )
+    rows = models.JSONField(
+        null=True,
+        verbose_name='Ингредиенты'
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Версия'
+    )
+
+    class Meta:
+        verbose_name = 'Сводка списка покупок'
+        verbose_name_plural = 'Сводки списков покупок'
+
+
+class TableVersion(models.Model):
+    """Время последнего изменения справочника.
+
+    Хранится в базе, а не в кэше, чтобы все воркеры и команды видели
+    одну и ту же версию.
+    """
+    table = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='Справочник'
+    )
+    changed_at = models.DateTimeField(
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
@@ -0,0 +1,210 @@
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+INSERT_RELATION_SQL = (
+    'INSERT INTO {table} ({user_column}, {target_column}) '
+    'SELECT %s, {target_pk} FROM {target_table} WHERE {target_pk} = %s '
+    'ON CONFLICT DO NOTHING'
+)
+DELETE_RELATION_SQL = (
+    'DELETE FROM {table} WHERE {user_column} = %s AND {target_column} = %s'
+)
+INSERT_RELATIONS_SQL = (
+    'INSERT INTO {table} ({user_column}, {target_column}) '
+    'SELECT %s, {target_pk} FROM {target_table} '
+    'WHERE {target_pk} IN ({placeholders}) '
+    'ON CONFLICT DO NOTHING RETURNING {target_column}'
+)
+DELETE_RELATIONS_SQL = (
+    'DELETE FROM {table} '
+    'WHERE {user_column} = %s AND {target_column} IN ({placeholders}) '
+    'RETURNING {target_column}'
+)
+CLEAR_RELATIONS_SQL = (
+    'DELETE FROM {table} WHERE {user_column} = %s '
+    'RETURNING {target_column}'
+)
+
+# Пакетное изменение связей: аргументы user_id, target_ids и delta.
+# Отдельные строки при этом сигналы post_save/post_delete не шлют.
+relations_changed = Signal()
+
+
+def format_sql(sql, connection, model, target_field, **kwargs):
+    quote = connection.ops.quote_name
+    target = model._meta.get_field(target_field)
+    target_model = target.related_model
+    return sql.format(
+        table=quote(model._meta.db_table),
+        user_column=quote(model._meta.get_field('user').column),
+        target_column=quote(target.column),
+        target_table=quote(target_model._meta.db_table),
+        target_pk=quote(target_model._meta.pk.column),
+        **kwargs
+    )
+
+
+def build_instance(model, user_id, target_field, target_id):
+    return model(**{'user_id': user_id, f'{target_field}_id': target_id})
+
+
+def add_relation(model, user_id, target_field, target_id):
+    """Создаёт связь пользователя с объектом одним INSERT.
+
+    Повтор и несуществующий объект не вызывают ошибку, а дают 0
+    вставленных строк. Сигнал post_save отправляется вручную, чтобы
+    счётчики и кэши обновлялись так же, как при save().
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        sql = format_sql(INSERT_RELATION_SQL, connection, model, target_field)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, target_id])
+            created = cursor.rowcount == 1
+        if created:
+            post_save.send(
+                sender=model,
+                instance=build_instance(
+                    model, user_id, target_field, target_id
+                ),
+                created=True, update_fields=None, raw=False, using=using
+            )
+    return created
+
+
+def remove_relation(model, user_id, target_field, target_id):
+    """Удаляет связь одним DELETE и возвращает, была ли она."""
+    using = router.db_for_write(model)
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        sql = format_sql(DELETE_RELATION_SQL, connection, model, target_field)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, target_id])
+            deleted = cursor.rowcount > 0
+        if deleted:
+            post_delete.send(
+                sender=model,
+                instance=build_instance(
+                    model, user_id, target_field, target_id
+                ),
+                using=using
+            )
+    return deleted
+
+
+def get_existing_targets(model, target_field, target_ids):
+    """Возвращает множество id объектов, которые есть в базе."""
+    target_model = model._meta.get_field(target_field).related_model
+    return set(target_model.objects.filter(
+        pk__in=target_ids
+    ).values_list('pk', flat=True))
+
+
+def execute_returning(model, target_field, sql, params, **kwargs):
+    """Выполняет INSERT или DELETE ... RETURNING и возвращает id объектов.
+
+    Статусы и счётчики строятся по тому, что сделала запись, а не по
+    предварительному чтению: параллельный запрос мог успеть вставить
+    или удалить те же строки.
+    """
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            format_sql(sql, connection, model, target_field, **kwargs),
+            params
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_placeholders(target_ids):
+    return ', '.join(['%s'] * len(target_ids))
+
+
+def add_relations(model, user_id, target_field, target_ids):
+    """Добавляет связи с несколькими объектами одним INSERT ... RETURNING.
+
+    Возвращает статус для каждого id: added, exists или not_found.
+    """
+    using = router.db_for_write(model)
+    unique_ids = list(dict.fromkeys(target_ids))
+    with transaction.atomic(using=using):
+        added = set(execute_returning(
+            model, target_field, INSERT_RELATIONS_SQL,
+            [user_id, *unique_ids], placeholders=get_placeholders(unique_ids)
+        ))
+        if added:
+            relations_changed.send(
+                sender=model, user_id=user_id, target_ids=list(added),
+                delta=1
+            )
+    existing = get_existing_targets(model, target_field, [
+        target_id for target_id in unique_ids if target_id not in added
+    ])
+    return {
+        target_id: (
+            ADDED if target_id in added
+            else EXISTS if target_id in existing else NOT_FOUND
+        )
+        for target_id in target_ids
+    }
+
+
+def delete_relations(model, user_id, target_field, target_ids):
+    """Удаляет связи одним DELETE ... RETURNING.
+
+    Возвращает id объектов, связи с которыми действительно удалены.
+    """
+    removed = execute_returning(
+        model, target_field, DELETE_RELATIONS_SQL,
+        [user_id, *target_ids], placeholders=get_placeholders(target_ids)
+    )
+    if removed:
+        relations_changed.send(
+            sender=model, user_id=user_id, target_ids=removed, delta=-1
+        )
+    return removed
+
+
+def remove_relations(model, user_id, target_field, target_ids):
+    """Удаляет связи с несколькими объектами одним DELETE.
+
+    Возвращает статус для каждого id: removed, absent или not_found.
+    """
+    using = router.db_for_write(model)
+    unique_ids = list(dict.fromkeys(target_ids))
+    with transaction.atomic(using=using):
+        removed = set(
+            delete_relations(model, user_id, target_field, unique_ids)
+        )
+    existing = get_existing_targets(model, target_field, [
+        target_id for target_id in unique_ids if target_id not in removed
+    ])
+    return {
+        target_id: (
+            REMOVED if target_id in removed
+            else ABSENT if target_id in existing else NOT_FOUND
+        )
+        for target_id in target_ids
+    }
+
+
+def clear_relations(model, user_id, target_field):
+    """Удаляет все связи пользователя и возвращает их число."""
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        removed = execute_returning(
+            model, target_field, CLEAR_RELATIONS_SQL, [user_id]
+        )
+        if removed:
+            relations_changed.send(
+                sender=model, user_id=user_id, target_ids=removed, delta=-1
+            )
+    return len(removed)
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, Exists, F, FloatField, OuterRef, Q,
+                              Subquery, Value, When)
+
+from .models import IngredientRecipe, Recipe
+
+
+def ingredient_names(recipe):
+    return Subquery(IngredientRecipe.objects.filter(
+        recipe=recipe
+    ).values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names'))
+
+
+def update_search_vector(recipe_id):
+    update_search_vectors(Recipe.objects.filter(pk=recipe_id))
+
+
+def update_search_vectors(queryset):
+    """Пересчитывает поисковые векторы рецептов одним запросом UPDATE."""
+    if connections[queryset.db].vendor != 'postgresql':
+        return
+    config = settings.RECIPE_SEARCH_CONFIG
+    queryset.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            ingredient_names(OuterRef('pk')), weight='B', config=config
+        )
+        + SearchVector('text', weight='C', config=config)
+    ))
+
+
+def search_recipes(queryset, value):
+    """Фильтрует рецепты по запросу и сортирует их по релевантности.
+
+    На PostgreSQL используется поле search_vector с GIN-индексом, на
+    остальных СУБД (SQLite в тестах) — поиск по подстроке.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', *Recipe._meta.ordering)
+    in_ingredients = Exists(IngredientRecipe.objects.filter(
+        recipe=OuterRef('pk'), ingredient__name__icontains=value
+    ))
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value) | in_ingredients
+    ).annotate(
+        rank=Case(
+            When(name__icontains=value, then=Value(1.0)),
+            When(in_ingredients, then=Value(0.4)),
+            default=Value(0.2),
+            output_field=FloatField()
+        )
+    ).order_by('-rank', *Recipe._meta.ordering)
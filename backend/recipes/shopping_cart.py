@@ -0,0 +1,58 @@
+from django.db.models import F, Sum
+
+from .models import IngredientRecipe, ShoppingCart, ShoppingCartSummary
+
+
+def aggregate_shopping_cart(user_id):
+    return list(IngredientRecipe.objects.filter(
+        recipe__cart__user_id=user_id
+    ).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit')
+    ).annotate(
+        total=Sum('amount')
+    ).order_by('name', 'measurement_unit'))
+
+
+def refresh_shopping_cart(user_id):
+    """Пересчитывает сводку в таблице ShoppingCartSummary.
+
+    Версия читается до агрегации: если список за это время изменился,
+    invalidate_shopping_carts уже увеличила её или увеличит после
+    коммита, и устаревшая сводка не переживёт сброс.
+    """
+    summary, _ = ShoppingCartSummary.objects.get_or_create(user_id=user_id)
+    rows = aggregate_shopping_cart(user_id)
+    ShoppingCartSummary.objects.filter(
+        user_id=user_id, version=summary.version
+    ).update(rows=rows)
+    return rows
+
+
+def get_shopping_cart(user_id):
+    rows = ShoppingCartSummary.objects.filter(
+        user_id=user_id, rows__isnull=False
+    ).values_list('rows', flat=True).first()
+    if rows is None:
+        return refresh_shopping_cart(user_id)
+    return rows
+
+
+def invalidate_shopping_carts(user_ids):
+    """Сбрасывает сводки; общая таблица видна всем воркерам сразу."""
+    ShoppingCartSummary.objects.filter(user_id__in=user_ids).update(
+        rows=None, version=F('version') + 1
+    )
+
+
+def invalidate_recipe_shopping_carts(recipe_id):
+    invalidate_shopping_carts(ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True))
+
+
+def invalidate_ingredient_shopping_carts(ingredient_id):
+    """Сбрасывает сводки списков с рецептами, где есть ингредиент."""
+    invalidate_shopping_carts(ShoppingCart.objects.filter(
+        recipe__consists_of__ingredient_id=ingredient_id
+    ).values_list('user_id', flat=True))
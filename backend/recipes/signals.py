@@ -0,0 +1,150 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import User
+from .counters import COUNTERS, change_counters
+from .images import schedule_renditions
+from .ingredient_index import reset_ingredient_index
+from .models import Ingredient, IngredientRecipe, Recipe, ShoppingCart, Tag
+from .relations import relations_changed
+from .search import update_search_vector, update_search_vectors
+from .shopping_cart import (invalidate_ingredient_shopping_carts,
+                            invalidate_recipe_shopping_carts,
+                            invalidate_shopping_carts)
+from .versions import (INGREDIENTS_TABLE, TAGS_TABLE, bump_content_generation,
+                       bump_table_version)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_shopping_carts([instance.user_id])
+    )
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
+    transaction.on_commit(
+        lambda: invalidate_recipe_shopping_carts(instance.recipe_id)
+    )
+    transaction.on_commit(lambda: update_search_vector(instance.recipe_id))
+    transaction.on_commit(bump_content_generation)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_content_generation)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_search_vector(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if not instance.image:
+        return
+    if instance.image_renditions.get('source') != instance.image.name:
+        transaction.on_commit(lambda: schedule_renditions(instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if reverse and action == 'pre_clear':
+        # После post_clear связей уже нет и рецепты тега не найти.
+        Recipe.objects.filter(tags=instance).touch()
+        transaction.on_commit(bump_content_generation)
+        return
+    if not action.startswith('post_') or (reverse and action == 'post_clear'):
+        return
+    if not reverse:
+        Recipe.objects.filter(pk=instance.pk).touch()
+    elif pk_set:
+        Recipe.objects.filter(pk__in=pk_set).touch()
+    transaction.on_commit(bump_content_generation)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {
+        'last_login', 'password'
+    }:
+        return
+    if kwargs.get('created'):
+        return
+    # Автор входит в кэшированное представление его рецептов; профиль
+    # пользователя без рецептов в кэше ответов не участвует.
+    if Recipe.objects.filter(author=instance).touch():
+        transaction.on_commit(bump_content_generation)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    if kwargs.get('created') is False:
+        Recipe.objects.filter(consists_of__ingredient=instance).touch()
+        # Название и единица измерения входят в сводки списков покупок.
+        transaction.on_commit(
+            lambda: invalidate_ingredient_shopping_carts(instance.pk)
+        )
+        # Названия ингредиентов проиндексированы в поиске рецептов.
+        transaction.on_commit(lambda: update_search_vectors(
+            Recipe.objects.filter(consists_of__ingredient_id=instance.pk)
+        ))
+    transaction.on_commit(reset_ingredient_index)
+    transaction.on_commit(lambda: bump_table_version(INGREDIENTS_TABLE))
+    transaction.on_commit(bump_content_generation)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    if kwargs.get('created') is False:
+        Recipe.objects.filter(tags=instance).touch()
+    transaction.on_commit(lambda: bump_table_version(TAGS_TABLE))
+    transaction.on_commit(bump_content_generation)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    # Связи с рецептами удаляются каскадом без m2m_changed.
+    Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(relations_changed, sender=ShoppingCart)
+def shopping_cart_batch_changed(sender, user_id, **kwargs):
+    transaction.on_commit(lambda: invalidate_shopping_carts([user_id]))
+
+
+def counter_receivers(model, counter_model, field, foreign_key):
+    """Подключает обновление счётчика к созданию и удалению строк."""
+    foreign_key = f'{foreign_key}_id'
+
+    @receiver(post_save, sender=model, weak=False)
+    def created(sender, instance, created, **kwargs):
+        if created:
+            change_counters(
+                counter_model, [getattr(instance, foreign_key)], field, 1
+            )
+
+    @receiver(post_delete, sender=model, weak=False)
+    def deleted(sender, instance, **kwargs):
+        change_counters(
+            counter_model, [getattr(instance, foreign_key)], field, -1
+        )
+
+    @receiver(relations_changed, sender=model, weak=False)
+    def batch_changed(sender, target_ids, delta, **kwargs):
+        change_counters(counter_model, target_ids, field, delta)
+
+
+for counter_model, field, model, foreign_key in COUNTERS:
+    counter_receivers(model, counter_model, field, foreign_key)
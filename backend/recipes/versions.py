@@ -0,0 +1,45 @@
+from time import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import TableVersion
+
+CONTENT_GENERATION_CACHE_KEY = 'content_generation'
+TAGS_TABLE = 'tags'
+INGREDIENTS_TABLE = 'ingredients'
+
+
+def get_table_version(table):
+    """Возвращает версию справочника: время его последнего изменения."""
+    changed_at = TableVersion.objects.filter(table=table).values_list(
+        'changed_at', flat=True
+    ).first()
+    if changed_at is None:
+        changed_at = TableVersion.objects.get_or_create(
+            table=table, defaults={'changed_at': timezone.now()}
+        )[0].changed_at
+    return changed_at.timestamp()
+
+
+def bump_table_version(table):
+    TableVersion.objects.update_or_create(
+        table=table, defaults={'changed_at': timezone.now()}
+    )
+
+
+def get_content_generation():
+    """Возвращает поколение содержимого рецептов.
+
+    Начальное значение берётся из текущего времени, чтобы после вытеснения
+    ключа из кэша счётчик не вернулся к уже использованному поколению.
+    """
+    cache.add(CONTENT_GENERATION_CACHE_KEY, int(time() * 1000), None)
+    return cache.get(CONTENT_GENERATION_CACHE_KEY)
+
+
+def bump_content_generation():
+    try:
+        cache.incr(CONTENT_GENERATION_CACHE_KEY)
+    except ValueError:
+        get_content_generation()
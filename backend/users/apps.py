@@ -1,7 +1,14 @@
 from django.apps import AppConfig
+from django.contrib.auth import password_validation
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = 'Пользователи'
+
+    def ready(self):
+        # Валидаторы паролей кэшируются на процесс; создаём их сразу,
+        # чтобы список CommonPasswordValidator читался при запуске,
+        # а не на первом запросе смены пароля.
+        password_validation.get_default_password_validators()
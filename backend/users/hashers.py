@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class ConfigurableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id с параметрами из настроек.
+
+    По умолчанию используются рекомендации OWASP (19 MiB, 2 прохода,
+    1 поток): стойкость выше PBKDF2, а нагрузка на ядро ниже. Хэши со
+    старыми параметрами пересчитываются при следующем входе.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
@@ -2,7 +2,35 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """Не даёт полному save() затереть счётчики устаревшими значениями.
+
+    Счётчики меняются атомарно через F() (recipes.counters), а объект в
+    памяти хранит значения на момент загрузки. Поэтому при сохранении
+    существующей записи счётчики пишутся, только если явно перечислены
+    в update_fields.
+    """
+    counter_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not force_insert and (
+            not self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(
+            force_insert=force_insert, force_update=force_update,
+            using=using, update_fields=update_fields
+        )
+
+
+class User(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(
         max_length=200,
         unique=True
@@ -13,6 +41,18 @@ class User(AbstractUser):
     last_name = models.CharField(
         max_length=150
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков'
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name', 'password')